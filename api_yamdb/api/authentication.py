@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .prometheus import count_cache_lookup
+
+# Поля пользователя, которые нужны permissions и сериализаторам
+USER_SNAPSHOT_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'bio', 'role',
+    'is_superuser', 'is_staff', 'is_active',
+)
+
+
+def user_cache_key(user_id):
+    return f'api:auth:user:{user_id}'
+
+
+def invalidate_user(user):
+    """Удаляет снимок пользователя из кэша."""
+    cache.delete(user_cache_key(getattr(user, api_settings.USER_ID_FIELD)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT аутентификация, которая берет пользователя из кэша.
+
+    В кэше по id пользователя хранится снимок полей USER_SNAPSHOT_FIELDS
+    на AUTH_USER_CACHE_TIMEOUT секунд, остальные поля модели загружаются
+    из базы только при обращении к ним. Снимок удаляется при сохранении
+    или удалении пользователя (api.signals), `QuerySet.update()` кэш
+    не сбрасывает.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        snapshot = cache.get(key)
+        count_cache_lookup('auth_user', snapshot is not None)
+        if snapshot is None:
+            user = super().get_user(validated_token)
+            snapshot = {
+                field: getattr(user, field) for field in USER_SNAPSHOT_FIELDS
+            }
+            cache.set(key, snapshot, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+
+        # from_db ожидает значения в порядке полей модели
+        field_names = [
+            field.attname for field in self.user_model._meta.concrete_fields
+            if field.attname in snapshot
+        ]
+        user = self.user_model.from_db(
+            router.db_for_read(self.user_model),
+            field_names,
+            [snapshot[name] for name in field_names],
+        )
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive'
+            )
+        return user
@@ -0,0 +1,123 @@
+"""
+Версии моделей для кэша ответов API и условных GET-запросов.
+
+    Для каждой модели в кэше хранится счетчик поколения. Любая запись
+    в модель увеличивает счетчик (api.signals) после коммита
+    транзакции, в которой она сделана. Ключ закэшированного
+    ответа и ETag включают текущие счетчики всех моделей, от которых
+    зависит ответ, поэтому после записи старые ответы просто
+    перестают совпадать.
+
+    Счетчики должны быть общими для всех процессов. Локальный кэш
+    (LocMemCache) у каждого воркера gunicorn свой, поэтому при
+    GUNICORN_WORKERS > 1 с ним кэш ответов и ETag отключаются,
+    см. versions_are_shared и проверку api.W001.
+
+    Note:
+        `QuerySet.update()` и `bulk_create()` сигналов не отправляют,
+        после них ответы обновятся через API_RESPONSE_CACHE_TIMEOUT.
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.cache import quote_etag
+from django.utils.http import urlencode
+
+GENERATION_KEY = 'api:generation:{}'
+RESPONSE_KEY = 'api:response:{}'
+
+
+def generation_name(model):
+    return model._meta.label_lower
+
+
+def initial_generation():
+    # Начальное значение не повторяется после перезапуска кэша,
+    # поэтому старые ответы не могут совпасть с новым поколением
+    return int(time.time() * 1000)
+
+
+def versions_are_shared():
+    """
+    Видят ли все процессы, обслуживающие запросы, одни и те же счетчики.
+    С локальным кэшем при нескольких воркерах запись увеличивает
+    счетчик только в обработавшем ее воркере, остальные отдавали бы
+    устаревшие ответы до перезапуска.
+    """
+    return settings.GUNICORN_WORKERS <= 1 or not isinstance(
+        caches['default'], LocMemCache
+    )
+
+
+def get_generations(*models):
+    """Текущие счетчики поколений моделей."""
+    keys = [GENERATION_KEY.format(generation_name(model)) for model in models]
+    generations = cache.get_many(keys)
+    missing = {
+        key: initial_generation() for key in keys if key not in generations
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        generations.update(missing)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(model):
+    """Увеличивает счетчик поколения модели."""
+    name = generation_name(model)
+    try:
+        cache.incr(GENERATION_KEY.format(name))
+    except ValueError:
+        cache.set(
+            GENERATION_KEY.format(name), initial_generation(), timeout=None
+        )
+
+
+def bump_generation_on_commit(model):
+    """
+    Увеличивает счетчик поколения модели после коммита текущей
+    транзакции, вне транзакции - сразу. GET-запрос между увеличением
+    и коммитом иначе закэшировал бы старые данные под новым поколением.
+    """
+    transaction.on_commit(partial(bump_generation, model))
+
+
+def normalized_query(request):
+    """Параметры запроса, отсортированные по имени и значению."""
+    return urlencode(sorted(
+        (name, value)
+        for name in request.query_params
+        for value in request.query_params.getlist(name)
+    ))
+
+
+def response_cache_key(request, models):
+    """
+    Ключ ответа: хост, путь, отсортированные параметры запроса
+    и счетчики поколений моделей.
+    """
+    generations = '.'.join(str(gen) for gen in get_generations(*models))
+    source = (
+        f'{request.get_host()}{request.path}?{normalized_query(request)}'
+        f'#{generations}'
+    )
+    return RESPONSE_KEY.format(hashlib.md5(source.encode()).hexdigest())
+
+
+def conditional_etag(request, models):
+    """
+    ETag ответа: зависит от пути, параметров запроса, формата ответа
+    и счетчиков поколений моделей.
+    """
+    generations = get_generations(*models)
+    source = '#'.join((
+        f'{request.path}?{normalized_query(request)}',
+        request.accepted_renderer.format,
+        '.'.join(str(gen) for gen in generations),
+    ))
+    return quote_etag(hashlib.md5(source.encode()).hexdigest())
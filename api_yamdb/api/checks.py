@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from .cache import versions_are_shared
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """Кэш ответов и ETag требуют общего для воркеров кэша."""
+    if versions_are_shared():
+        return []
+    return [
+        Warning(
+            f'Local memory cache with {settings.GUNICORN_WORKERS} gunicorn '
+            'workers: API response cache and conditional GET are disabled.',
+            hint='Set CACHE_BACKEND to a shared cache, e.g. '
+                 'django.core.cache.backends.memcached.MemcachedCache.',
+            id='api.W001',
+        )
+    ]
@@ -1,7 +1,62 @@
+import math
+
 import django_filters as filters
+from django.db.models import F
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework.filters import OrderingFilter, SearchFilter
 from reviews.models import Title
 
 
+class TrigramSearchFilter(SearchFilter):
+    """
+    Поиск DRF, который на PostgreSQL использует trigram индекс.
+    Поиск без префикса делается lookup `trgm_icontains`
+    вместо `icontains`, результаты при этом совпадают.
+    """
+
+    def construct_search(self, field_name):
+        lookup = self.lookup_prefixes.get(field_name[0])
+        if lookup:
+            field_name = field_name[1:]
+        else:
+            lookup = 'trgm_icontains'
+        return LOOKUP_SEP.join([field_name, lookup])
+
+
+class NullsLastOrderingFilter(OrderingFilter):
+    """
+    Сортировка DRF, в которой NULL значения всегда в конце:
+    при `?ordering=-rating` произведения без отзывов идут последними.
+    В конец сортировки добавляется `id`, чтобы порядок был однозначным
+    и страницы не пересекались.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        return queryset.order_by(
+            *self.get_order_expressions(queryset.model, ordering)
+        )
+
+    def get_order_expressions(self, model, ordering):
+        expressions = []
+        for field_name in ordering:
+            descending = field_name.startswith('-')
+            field_name = field_name.lstrip('-')
+            # NULLS LAST только для nullable полей, иначе PostgreSQL
+            # не использует индекс при сортировке по убыванию
+            nulls_last = model._meta.get_field(field_name).null
+            expression = F(field_name)
+            expressions.append(
+                expression.desc(nulls_last=nulls_last) if descending
+                else expression.asc(nulls_last=nulls_last)
+            )
+        if not {'id', 'pk'} & {name.lstrip('-') for name in ordering}:
+            expressions.append(F('id').asc())
+        return expressions
+
+
 class TitleFilter(filters.FilterSet):
     """Кастомный фильтр для queryset модели Title"""
     genre = filters.CharFilter(field_name="genre__slug", lookup_expr='exact')
@@ -9,8 +64,33 @@ class TitleFilter(filters.FilterSet):
         field_name="category__slug",
         lookup_expr='exact'
     )
+    # `LIKE '%x%'` по полю использует trigram индекс на PostgreSQL.
     name = filters.CharFilter(field_name="name", lookup_expr='contains')
+    # Фильтры сравнивают рейтинг, округленный как в ответе (`round`:
+    # x.5 к четному), но условием на само поле, чтобы работали индексы
+    rating__gte = filters.NumberFilter(method='filter_rating_gte')
+    rating__lte = filters.NumberFilter(method='filter_rating_lte')
 
     class Meta:
         model = Title
-        fields = ('name', 'year', 'genre', 'category')
+        fields = (
+            'name', 'year', 'genre', 'category', 'rating__gte', 'rating__lte'
+        )
+
+    def filter_rating_gte(self, queryset, name, value):
+        """
+        Округленный рейтинг >= N: рейтинг больше N - 0.5,
+        а для четного N и равный N - 0.5 (он округляется до N).
+        """
+        bound = math.ceil(value)
+        lookup = 'rating__gte' if bound % 2 == 0 else 'rating__gt'
+        return queryset.filter(**{lookup: bound - 0.5})
+
+    def filter_rating_lte(self, queryset, name, value):
+        """
+        Округленный рейтинг <= N: рейтинг меньше N + 0.5,
+        а для четного N и равный N + 0.5 (он округляется до N).
+        """
+        bound = math.floor(value)
+        lookup = 'rating__lte' if bound % 2 == 0 else 'rating__lt'
+        return queryset.filter(**{lookup: bound + 0.5})
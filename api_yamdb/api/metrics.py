@@ -0,0 +1,192 @@
+"""
+Сбор метрик запросов API.
+
+    RequestMetricsMiddleware замеряет для каждого запроса время
+    обработки, статус и размер ответа, добавляет их в заголовок
+    `Server-Timing` и передает в приемники из настройки
+    REQUEST_METRICS_SINKS. Количество SQL запросов и время в базе
+    замеряются только для доли запросов REQUEST_METRICS_SAMPLE_RATE,
+    у остальных `queries` и `db_ms` равны None.
+
+    Запросы группируются по вьюсету и действию DRF,
+    например `TitleViewSet.list` или `UserCreateAPIView.post`.
+"""
+import logging
+import random
+import socket
+import time
+from collections import namedtuple
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# queries и db_ms - None, если SQL запросы не замерялись
+RequestMetrics = namedtuple('RequestMetrics', (
+    'route', 'method', 'status', 'queries', 'db_ms', 'view_ms', 'total_ms',
+    'response_bytes', 'sample_rate',
+))
+
+UNKNOWN_ROUTE = 'unknown'
+
+
+def get_route_name(view_func, method):
+    """Имя маршрута: класс вьюсета и действие DRF."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', UNKNOWN_ROUTE)
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+def get_response_bytes(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+class QueryTimer:
+    """Обертка `execute_wrapper`, считает запросы и время в базе."""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.queries += 1
+
+
+class LogSink:
+    """
+    Приемник метрик: строка в лог `api.metrics`.
+    Пишутся только запросы с замером SQL.
+    """
+
+    def send(self, metrics):
+        if metrics.queries is None:
+            return
+        logger.info(
+            'route=%s method=%s status=%s queries=%s db_ms=%.1f '
+            'view_ms=%.1f total_ms=%.1f bytes=%s',
+            metrics.route, metrics.method, metrics.status, metrics.queries,
+            metrics.db_ms, metrics.view_ms, metrics.total_ms,
+            metrics.response_bytes,
+        )
+
+
+class StatsdSink:
+    """
+    Приемник метрик: пакеты StatsD по UDP.
+    Метрики SQL запросов отправляются с частотой выборки `@rate`.
+    """
+
+    def __init__(self, host='localhost', port=8125, prefix='yamdb.request'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def format(self, metrics):
+        name = f'{self.prefix}.{metrics.route}'
+        lines = [
+            f'{name}.count:1|c',
+            f'{name}.status.{metrics.status}:1|c',
+            f'{name}.view:{metrics.view_ms:.3f}|ms',
+            f'{name}.total:{metrics.total_ms:.3f}|ms',
+        ]
+        if metrics.queries is not None:
+            rate = ''
+            if metrics.sample_rate < 1:
+                rate = f'|@{metrics.sample_rate}'
+            lines += [
+                f'{name}.queries:{metrics.queries}|h{rate}',
+                f'{name}.db:{metrics.db_ms:.3f}|ms{rate}',
+            ]
+        if metrics.response_bytes is not None:
+            lines.append(f'{name}.bytes:{metrics.response_bytes}|h')
+        return '\n'.join(lines).encode()
+
+    def send(self, metrics):
+        try:
+            self.socket.sendto(self.format(metrics), self.address)
+        except OSError:
+            # Потерянный пакет метрик не должен влиять на запрос
+            pass
+
+
+def load_sinks():
+    return [
+        import_string(sink['BACKEND'])(**sink.get('OPTIONS', {}))
+        for sink in settings.REQUEST_METRICS_SINKS
+    ]
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware для замера запросов, должен быть первым в MIDDLEWARE,
+    чтобы время `total` включало остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        self.sinks = load_sinks()
+
+    def __call__(self, request):
+        sampled = bool(self.sample_rate) and (
+            random.random() < self.sample_rate
+        )
+        request._metrics_route = UNKNOWN_ROUTE
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            if sampled:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        finished = time.perf_counter()
+
+        view_started = getattr(request, '_metrics_view_started', finished)
+        metrics = RequestMetrics(
+            route=request._metrics_route,
+            method=request.method,
+            status=response.status_code,
+            queries=timer.queries if sampled else None,
+            db_ms=timer.duration * 1000 if sampled else None,
+            view_ms=(finished - view_started) * 1000,
+            total_ms=(finished - started) * 1000,
+            response_bytes=get_response_bytes(response),
+            sample_rate=self.sample_rate,
+        )
+        timings = [
+            f'view;dur={metrics.view_ms:.1f}',
+            f'total;dur={metrics.total_ms:.1f}',
+        ]
+        if sampled:
+            timings.insert(0, (
+                f'db;dur={metrics.db_ms:.1f};'
+                f'desc="{metrics.queries} queries"'
+            ))
+        response['Server-Timing'] = ', '.join(timings)
+        for sink in self.sinks:
+            try:
+                sink.send(metrics)
+            except Exception:
+                logger.exception('Request metrics sink %r failed', sink)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_metrics_route'):
+            request._metrics_route = get_route_name(
+                view_func, request.method
+            )
+            request._metrics_view_started = time.perf_counter()
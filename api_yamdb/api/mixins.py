@@ -1,8 +1,19 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.mixins import (CreateModelMixin, DestroyModelMixin,
                                    ListModelMixin)
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from .cache import (bump_generation_on_commit, conditional_etag,
+                    response_cache_key, versions_are_shared)
 from .permissions import AdminOrReadonly
+from .prometheus import count_cache_lookup
 
 
 class CreateListDeleteMixinSet(
@@ -16,3 +27,151 @@ class CreateListDeleteMixinSet(
     POST, DELETE - только администраторам.
     """
     permission_classes = (AdminOrReadonly, )
+
+
+class CachedResponseMixin:
+    """
+    Миксин для вьюсетов: кэширует ответы list и retrieve
+    для анонимных пользователей.
+    В `cache_models` перечисляются модели, при записи в которые
+    закэшированные ответы устаревают. Без общего кэша
+    (см. api.cache.versions_are_shared) ответы не кэшируются.
+    """
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated or not versions_are_shared():
+            return handler(request, *args, **kwargs)
+
+        key = response_cache_key(request, self.cache_models)
+        data = cache.get(key)
+        count_cache_lookup('response', data is not None)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.API_RESPONSE_CACHE_TIMEOUT)
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Миксин для вьюсетов: ETag для list и retrieve.
+    ETag считается по версиям моделей из `cache_models`, поэтому
+    на `If-None-Match` ответ 304 отдается без запросов к базе
+    и сериализации. Last-Modified не отдается: с точностью до секунды
+    запись в ту же секунду, что и чтение клиента, давала бы
+    устаревший ответ 304 на `If-Modified-Since`.
+    Без общего кэша (см. api.cache.versions_are_shared) ETag
+    не отдается.
+    """
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if not versions_are_shared():
+            return handler(request, *args, **kwargs)
+
+        etag = conditional_etag(request, self.cache_models)
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        return response
+
+
+class NestedViewSetMixin:
+    """
+    Миксин для вложенных вьюсетов, например
+    `titles/<title_id>/reviews/<review_id>/comments/`.
+    Вся цепочка родителей из URL проверяется одним запросом
+    на существование `parent_model`, результат запоминается
+    до конца запроса. В `parent_lookups` сопоставляются
+    параметры URL и поля `parent_model`.
+    """
+    parent_model = None
+    parent_lookups = {}
+
+    def check_parent(self):
+        """Ответ 404, если родителя из URL нет."""
+        if getattr(self, '_parent_exists', None) is None:
+            lookups = {
+                field: self.kwargs[kwarg]
+                for kwarg, field in self.parent_lookups.items()
+            }
+            try:
+                self._parent_exists = self.parent_model.objects.filter(
+                    **lookups
+                ).exists()
+            except (TypeError, ValueError):
+                self._parent_exists = False
+        if not self._parent_exists:
+            raise Http404(
+                f'No {self.parent_model._meta.object_name} matches '
+                'the given query.'
+            )
+
+
+class BulkCreateMixin:
+    """
+    Миксин для вьюсетов: POST `<ресурс>/` принимает и список объектов.
+    Отдельного маршрута нет, поэтому slug вроде `bulk` не перекрывается.
+    Пакет проверяется целиком и создается в одной транзакции:
+    если хотя бы один объект не прошел проверку, не создается ни один,
+    а в ответе 400 ошибки перечислены по объектам пакета.
+    Сериализатор `bulk_serializer_class` должен использовать
+    `BulkListSerializer` или его наследника.
+    """
+    bulk_serializer_class = None
+    bulk_max_items = 1000
+
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.create_many(request)
+        return super().create(request, *args, **kwargs)
+
+    def create_many(self, request):
+        if len(request.data) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [
+                f'Expected at most {self.bulk_max_items} items.'
+            ]})
+        serializer = self.bulk_serializer_class(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            instances = serializer.save()
+            # bulk_create не отправляет сигналы, версии моделей
+            # для кэша ответов увеличиваем сами после коммита
+            for model in serializer.written_models:
+                bump_generation_on_commit(model)
+        return Response(
+            self.get_bulk_response_data(instances),
+            status=status.HTTP_201_CREATED,
+        )
+
+    def get_bulk_response_data(self, instances):
+        return self.get_serializer(instances, many=True).data
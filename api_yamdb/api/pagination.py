@@ -0,0 +1,247 @@
+import json
+
+from django.core.paginator import (EmptyPage, InvalidPage, Page,
+                                   PageNotAnInteger)
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.settings import api_settings
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк queryset по статистике планировщика PostgreSQL.
+    Для других баз данных возвращает None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class LookaheadPage(Page):
+    """Страница, которая знает о следующей странице без общего count."""
+
+    def __init__(self, object_list, number, paginator, next_exists):
+        super().__init__(object_list, number, paginator)
+        self.next_exists = next_exists
+
+    def has_next(self):
+        return self.next_exists
+
+
+class LargeTablePaginator(DjangoPaginator):
+    """
+    Paginator, который считает точное количество строк только для
+    небольших выборок (не больше `exact_count_limit`).
+
+    Для больших выборок `count` оценивается по статистике базы данных
+    (`estimate`) или не считается вовсе (`none`), а наличие следующей
+    страницы определяется выборкой одной лишней строки.
+    """
+
+    def __init__(self, object_list, per_page, count_mode=COUNT_EXACT,
+                 exact_count_limit=1000, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_mode = count_mode
+        self.exact_count_limit = exact_count_limit
+        self._count_is_exact = True
+
+    @cached_property
+    def count(self):
+        if self.count_mode == COUNT_EXACT:
+            return super().count
+
+        limit = self.exact_count_limit
+        count = self.object_list[:limit + 1].count()
+        if count <= limit:
+            return count
+
+        if self.count_mode == COUNT_ESTIMATE:
+            estimate = estimate_count(self.object_list)
+            if estimate is None:
+                return super().count
+            self._count_is_exact = False
+            return max(estimate, count)
+
+        self._count_is_exact = False
+        return None
+
+    @property
+    def count_is_exact(self):
+        return self.count is not None and self._count_is_exact
+
+    @cached_property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return super().num_pages
+
+    def validate_number(self, number):
+        if self.count_is_exact:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        if self.count_is_exact:
+            return super().page(number)
+
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not object_list and number > 1:
+            raise EmptyPage('That page contains no results')
+        return LookaheadPage(
+            object_list[:self.per_page],
+            number,
+            self,
+            len(object_list) > self.per_page,
+        )
+
+
+class LargeTablePagination(PageNumberPagination):
+    """
+    Пагинация по номеру страницы без точного `COUNT(*)` для больших выборок.
+
+    Режим подсчета задается во вьюсете атрибутами `count_mode`
+    (`exact`, `estimate` или `none`) и `exact_count_limit`:
+    выборки не больше `exact_count_limit` всегда считаются точно.
+    """
+    django_paginator_class = LargeTablePaginator
+    count_mode = COUNT_EXACT
+    exact_count_limit = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(
+            queryset,
+            page_size,
+            count_mode=getattr(view, 'count_mode', self.count_mode),
+            exact_count_limit=getattr(
+                view, 'exact_count_limit', self.exact_count_limit
+            ),
+        )
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+            raise NotFound(msg)
+
+        if (paginator.count_is_exact and paginator.num_pages > 1
+                and self.template is not None):
+            self.display_page_controls = True
+
+        self.request = request
+        return list(self.page)
+
+
+class FixedOrderingCursorPagination(CursorPagination):
+    """
+    Keyset пагинация всегда в порядке `ordering`, даже если
+    у вьюсета есть фильтр сортировки.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+
+class PageNumberOrCursorPagination(BasePagination):
+    """
+    Пагинация по номеру страницы по умолчанию.
+    Keyset (cursor) пагинация, если в запросе передан `?pagination=cursor`
+    или `cursor` из ссылок `next`/`previous`.
+
+    Keyset пагинация не делает `OFFSET n` и `COUNT(*)`, поэтому время
+    ответа не растет с номером страницы. Порядок задается атрибутом
+    `ordering` и должен поддерживаться индексом, сортировка из запроса
+    (`?ordering=`) доступна только с пагинацией по номеру страницы.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    ordering = ('-pk',)
+    ordering_query_param = api_settings.ORDERING_PARAM
+    page_number_class = LargeTablePagination
+    cursor_class = FixedOrderingCursorPagination
+
+    def get_cursor_paginator(self):
+        paginator = self.cursor_class()
+        paginator.ordering = self.ordering
+        return paginator
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == self.cursor_mode
+            or self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            if self.ordering_query_param in request.query_params:
+                # Курсор хранит позицию только для порядка `ordering`
+                raise ValidationError({
+                    self.ordering_query_param: (
+                        'Ordering is not supported with cursor pagination.'
+                    )
+                })
+            self.paginator = self.get_cursor_paginator()
+        else:
+            self.paginator = self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_schema_fields(self, view):
+        return self.page_number_class().get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view)
+
+    @property
+    def display_page_controls(self):
+        paginator = getattr(self, 'paginator', None)
+        return paginator is not None and paginator.display_page_controls
+
+
+class TitlePagination(PageNumberOrCursorPagination):
+    """Пагинация произведений, keyset по индексу (name, id)."""
+    ordering = ('name', 'id')
+
+
+class PubDatePagination(PageNumberOrCursorPagination):
+    """Пагинация отзывов и комментариев, keyset по (-pub_date, id)."""
+    ordering = ('-pub_date', 'id')
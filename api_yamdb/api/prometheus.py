@@ -0,0 +1,128 @@
+"""
+Метрики Prometheus для эндпоинта /metrics.
+
+    Метрики запросов пишет PrometheusSink из RequestMetricsMiddleware:
+    счетчик и время ответа по каждому запросу, SQL запросы - по доле
+    REQUEST_METRICS_SAMPLE_RATE. Счетчики кэша - кэш ответов и кэш
+    пользователей JWT аутентификации.
+    Глубина очереди писем считается запросом к базе при каждом сборе
+    метрик. Занятость воркеров gunicorn пишут хуки gunicorn.conf.py.
+
+    При нескольких воркерах gunicorn переменная окружения
+    PROMETHEUS_MULTIPROC_DIR должна указывать на общий каталог
+    до запуска процессов: каждый воркер пишет метрики в свои файлы,
+    а /metrics собирает их со всех воркеров.
+"""
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily
+from reviews.models import EmailOutbox
+
+REQUESTS = Counter(
+    'yamdb_http_requests_total',
+    'HTTP requests by route',
+    ('route', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'yamdb_http_request_duration_seconds',
+    'HTTP request duration',
+    ('route', 'method'),
+)
+DB_QUERIES = Histogram(
+    'yamdb_db_queries_per_request',
+    'Sampled number of SQL queries per request',
+    ('route',),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, float('inf')),
+)
+DB_DURATION = Histogram(
+    'yamdb_db_duration_seconds',
+    'Sampled time spent in SQL queries per request',
+    ('route',),
+)
+CACHE_REQUESTS = Counter(
+    'yamdb_cache_requests_total',
+    'Cache lookups by cache and result (hit or miss)',
+    ('cache', 'result'),
+)
+
+
+def count_cache_lookup(cache_name, hit):
+    CACHE_REQUESTS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+class PrometheusSink:
+    """
+    Приемник метрик RequestMetricsMiddleware.
+    Счетчик и время ответа пишутся для каждого запроса,
+    гистограммы SQL - только для запросов с замером SQL.
+    """
+
+    def send(self, metrics):
+        REQUESTS.labels(metrics.route, metrics.method, metrics.status).inc()
+        REQUEST_DURATION.labels(metrics.route, metrics.method).observe(
+            metrics.total_ms / 1000
+        )
+        if metrics.queries is None:
+            return
+        DB_QUERIES.labels(metrics.route).observe(metrics.queries)
+        DB_DURATION.labels(metrics.route).observe(metrics.db_ms / 1000)
+
+
+class OutboxCollector:
+    """Глубина очереди писем EmailOutbox в момент сбора метрик."""
+
+    def describe(self):
+        # Без describe registry вызывает collect при регистрации,
+        # то есть делает запрос к базе при импорте модуля
+        return self.families()
+
+    def families(self):
+        return (
+            GaugeMetricFamily(
+                'yamdb_email_outbox_pending',
+                'Emails waiting to be sent, including delayed retries',
+            ),
+            GaugeMetricFamily(
+                'yamdb_email_outbox_failed',
+                'Emails that ran out of send attempts',
+            ),
+        )
+
+    def collect(self):
+        pending, failed = self.families()
+        unsent = EmailOutbox.objects.filter(sent_at__isnull=True)
+        max_attempts = settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+        pending.add_metric(
+            (), unsent.filter(attempts__lt=max_attempts).count()
+        )
+        failed.add_metric(
+            (), unsent.filter(attempts__gte=max_attempts).count()
+        )
+        return [pending, failed]
+
+
+outbox_collector = OutboxCollector()
+
+if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    REGISTRY.register(outbox_collector)
+
+
+def get_registry():
+    if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(outbox_collector)
+    return registry
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus."""
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,30 @@
+from rest_framework.renderers import BaseRenderer
+from reviews.exports import FORMATS
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Рендерер выгрузок reviews.exports. Строки выгрузки вьюсет отдает
+    потоком сам, через рендерер проходят только ответы с ошибками:
+    они кодируются одной строкой в том же формате.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        return b''.join(
+            FORMATS[self.format](tuple(data), [tuple(data.values())])
+        )
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
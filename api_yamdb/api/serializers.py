@@ -1,11 +1,93 @@
 import datetime as dt
+from collections import Counter
 
-from django.db.models import Avg
+from django.db import connections, router
 from rest_framework import serializers, validators
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
-from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
-                            Title, User)
+from reviews.leaderboards import schedule_rebuild
+from reviews.models import (Category, Comment, Genre, GenreTitle,
+                            LeaderboardEntry, Review, Title, User)
+
+from .tokens import confirmation_code_generator
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Сериализатор для пакетного создания объектов.
+    Уникальность полей проверяется для всего пакета одним запросом
+    `IN` на поле вместо запроса на каждый объект, объекты
+    создаются одним `bulk_create`. Ошибки возвращаются списком
+    по одному словарю на каждый объект пакета.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unique_fields = []
+        for name, field in self.child.fields.items():
+            unique = [
+                validator for validator in field.validators
+                if isinstance(validator, validators.UniqueValidator)
+            ]
+            if unique:
+                field.validators = [
+                    validator for validator in field.validators
+                    if validator not in unique
+                ]
+                self.unique_fields.append((name, unique[0]))
+
+    @property
+    def written_models(self):
+        """Модели, в которые пишет пакет."""
+        return (self.child.Meta.model,)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not (data or self.allow_empty):
+            # Ошибку формата пакета формирует ListSerializer
+            return super().to_internal_value(data)
+        items, errors = [], []
+        for item in data:
+            try:
+                items.append(self.child.run_validation(item))
+                errors.append({})
+            except ValidationError as exc:
+                items.append(None)
+                errors.append(exc.detail)
+        # Пакетные проверки выполняются и при ошибках в отдельных
+        # объектах, чтобы в ответе были все ошибки пакета
+        valid = [
+            (item, item_errors) for item, item_errors in zip(items, errors)
+            if item is not None
+        ]
+        self.validate_batch(
+            [item for item, _ in valid],
+            [item_errors for _, item_errors in valid],
+        )
+        if any(errors):
+            raise ValidationError(errors)
+        return items
+
+    def validate_batch(self, items, errors):
+        """Проверки всего пакета, ошибки дописываются в `errors`."""
+        for name, validator in self.unique_fields:
+            values = [item[name] for item in items]
+            duplicates = {
+                value for value, count in Counter(values).items() if count > 1
+            }
+            existing = set(
+                validator.queryset.filter(
+                    **{f'{name}__in': set(values)}
+                ).values_list(name, flat=True)
+            )
+            for value, item_errors in zip(values, errors):
+                if value in duplicates or value in existing:
+                    item_errors[name] = [validator.message]
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.objects.bulk_create(
+            model(**attrs) for attrs in validated_data
+        )
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -49,6 +131,28 @@ class GenreSerializer(serializers.ModelSerializer):
         model = Genre
 
 
+class CategoryBulkSerializer(CategorySerializer):
+    """
+    Сериализатор для пакетного создания категорий. BulkListSerializer
+    подключен только здесь: вложенный CategorySerializer остается
+    обычным.
+    """
+
+    class Meta(CategorySerializer.Meta):
+        list_serializer_class = BulkListSerializer
+
+
+class GenreBulkSerializer(GenreSerializer):
+    """
+    Сериализатор для пакетного создания жанров. BulkListSerializer
+    подключен только здесь: вложенный `GenreSerializer(many=True)`
+    остается обычным ListSerializer.
+    """
+
+    class Meta(GenreSerializer.Meta):
+        list_serializer_class = BulkListSerializer
+
+
 class TitleSerializer(serializers.ModelSerializer):
     """Сериализатор для упаковки произведений"""
     genre = GenreSerializer(many=True, read_only=True)
@@ -64,11 +168,8 @@ class TitleSerializer(serializers.ModelSerializer):
 
     def get_rating(self, obj):
         """Получаем среднюю оценку произведения по оценкам пользователей"""
-        rating = Review.objects.filter(
-            title=obj.id
-        ).aggregate(Avg('score'))['score__avg']
-        if rating is not None:
-            return round(rating)
+        if obj.rating is not None:
+            return round(obj.rating)
         return None
 
     def validate_year(self, value):
@@ -78,26 +179,40 @@ class TitleSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Произведение еще не вышло')
         return value
 
+    def get_initial_list(self, field_name):
+        """Список из данных запроса: multipart (QueryDict) или JSON."""
+        if hasattr(self.initial_data, 'getlist'):
+            return self.initial_data.getlist(field_name)
+        return self.initial_data.get(field_name, [])
+
     def validate(self, data):
         """Получаем первоначальные данные, переданные в поле `genre`
         и поле `category`, проводим их валидацию.
+        Все slug жанров проверяются одним запросом, найденные
+        объекты сохраняются в `data` для `create` и `update`.
         """
-        init_genre = self.initial_data.getlist('genre')
+        init_genre = self.get_initial_list('genre')
         if init_genre:
 
-            if not(type(init_genre) == list):
+            if not isinstance(init_genre, list) or not all(
+                isinstance(slug, str) for slug in init_genre
+            ):
                 raise ValidationError(
                     f'`genre`: Invalid data format `{init_genre}`.'
                     f'Expected a list, but got `{type(init_genre)}`.'
                 )
 
-            for slug in init_genre:
-                if not Genre.objects.filter(slug=slug).exists():
-                    raise ValidationError(
-                        f'`genre`: Does not exist slug str `{slug}`.'
-                    )
+            genres = Genre.objects.in_bulk(init_genre, field_name='slug')
+            missing = [slug for slug in init_genre if slug not in genres]
+            if missing:
+                raise ValidationError([
+                    f'`genre`: Does not exist slug str `{slug}`.'
+                    for slug in missing
+                ])
 
-            data['genre'] = init_genre
+            data['genre'] = list(
+                dict.fromkeys(genres[slug] for slug in init_genre)
+            )
 
         init_category = self.initial_data.get('category')
         if not init_category:
@@ -105,29 +220,28 @@ class TitleSerializer(serializers.ModelSerializer):
                 '`category`: This field is required.'
             )
 
-        if not Category.objects.filter(slug=init_category).exists():
+        category = Category.objects.filter(slug=init_category).first()
+        if category is None:
             raise ValidationError(
                 f'`category`: Does not exist slug str `{init_category}.`'
             )
 
-        data['category'] = Category.objects.get(slug=init_category)
+        data['category'] = category
 
         return data
 
     def create(self, validated_data):
-        genres = validated_data.pop('genre')
+        genres = validated_data.pop('genre', [])
         title, status = Title.objects.get_or_create(**validated_data)
-        genre = Genre.objects.filter(slug__in=genres)
-        title.genre.set(genre)
+        title.genre.set(genres)
 
         return title
 
     def update(self, instance, validated_data):
 
-        if validated_data.get('genre'):
-            genres = validated_data.pop('genre')
-            genre = Genre.objects.filter(slug__in=genres)
-            instance.genre.set(genre)
+        genres = validated_data.pop('genre', None)
+        if genres:
+            instance.genre.set(genres)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -136,6 +250,103 @@ class TitleSerializer(serializers.ModelSerializer):
         return instance
 
 
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    """Сериализатор для упаковки мест в таблице лидеров"""
+    id = serializers.IntegerField(source='title_id')
+    rating = serializers.SerializerMethodField()
+
+    class Meta:
+        fields = ('position', 'id', 'name', 'year', 'rating', 'review_count')
+        model = LeaderboardEntry
+
+    def get_rating(self, obj):
+        """Рейтинг округляется так же, как у произведений"""
+        return round(obj.rating)
+
+
+class TitleBulkListSerializer(BulkListSerializer):
+    """
+    Пакетное создание произведений: slug жанров и категорий всего
+    пакета проверяются одним запросом `IN` каждые, связи с жанрами
+    создаются одним `bulk_create`.
+    """
+
+    @property
+    def written_models(self):
+        return (Title, GenreTitle)
+
+    def validate_batch(self, items, errors):
+        super().validate_batch(items, errors)
+        categories = Category.objects.in_bulk(
+            {item['category'] for item in items}, field_name='slug'
+        )
+        genres = Genre.objects.in_bulk(
+            {slug for item in items for slug in item['genre']},
+            field_name='slug',
+        )
+        for item, item_errors in zip(items, errors):
+            if item['category'] not in categories:
+                item_errors['category'] = [
+                    f'Does not exist slug str `{item["category"]}`.'
+                ]
+            else:
+                item['category'] = categories[item['category']]
+            missing = [slug for slug in item['genre'] if slug not in genres]
+            if missing:
+                item_errors['genre'] = [
+                    f'Does not exist slug str `{slug}`.' for slug in missing
+                ]
+            else:
+                item['genre'] = [genres[slug] for slug in item['genre']]
+
+    def create(self, validated_data):
+        genres = [attrs.pop('genre') for attrs in validated_data]
+        titles = [Title(**attrs) for attrs in validated_data]
+        connection = connections[router.db_for_write(Title)]
+        if connection.features.can_return_ids_from_bulk_insert:
+            Title.objects.bulk_create(titles)
+        else:
+            # Без RETURNING (sqlite) id созданных строк неизвестны
+            for title in titles:
+                title.save()
+        GenreTitle.objects.bulk_create(
+            GenreTitle(title=title, genre=genre)
+            for title, title_genres in zip(titles, genres)
+            for genre in dict.fromkeys(title_genres)
+        )
+        # bulk_create не отправляет сигналы (а на sqlite произведения
+        # сохраняются по одному и сигналы есть), поэтому таблицы лидеров
+        # категорий и жанров пакета на любой базе перестраиваются явно
+        boards = {
+            (LeaderboardEntry.CATEGORY, title.category.slug)
+            for title in titles
+        } | {
+            (LeaderboardEntry.GENRE, genre.slug)
+            for title_genres in genres for genre in title_genres
+        }
+        for kind, slug in sorted(boards):
+            schedule_rebuild(kind, slug)
+        return titles
+
+
+class TitleBulkSerializer(TitleSerializer):
+    """
+    Сериализатор для пакетного создания произведений.
+    Жанры и категория передаются slug.
+    """
+    genre = serializers.ListField(
+        child=serializers.SlugField(), required=False, default=list
+    )
+    category = serializers.SlugField()
+
+    class Meta(TitleSerializer.Meta):
+        list_serializer_class = TitleBulkListSerializer
+
+    def validate(self, data):
+        """Slug проверяются для всего пакета в TitleBulkListSerializer"""
+        return data
+
+
 class GenreTitles(serializers.ModelSerializer):
 
     class Meta:
@@ -269,8 +480,11 @@ class ConfirmationSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         user = get_object_or_404(User, username=attrs['username'])
-        if not user.confirmation_code == attrs['confirmation_code']:
+        if not confirmation_code_generator.check_code(
+            user, attrs['confirmation_code']
+        ):
             raise serializers.ValidationError(
                 {'confirmation_code': 'Неверный код подтверждения.'}
             )
+        attrs['user'] = user
         return attrs
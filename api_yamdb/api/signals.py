@@ -0,0 +1,47 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from reviews.leaderboards import leaderboard_changed
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title, User)
+
+from .authentication import invalidate_user
+from .cache import bump_generation_on_commit
+
+# Модели, от версий которых зависят кэш ответов API и ETag
+VERSIONED_MODELS = (
+    Title, Genre, Category, GenreTitle, Review, Comment, User,
+)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Сбрасывает кэш аутентификации при изменении пользователя."""
+    invalidate_user(instance)
+
+
+def bump_model_generation(sender, **kwargs):
+    """Увеличивает версию модели при записи в нее."""
+    bump_generation_on_commit(sender)
+
+
+# Подписка только на нужные модели: у моделей без обработчиков
+# post_delete `QuerySet.delete()` выполняется одним DELETE
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_generation, sender=model)
+    post_delete.connect(bump_model_generation, sender=model)
+
+
+@receiver(leaderboard_changed)
+def bump_leaderboard_generation(sender, **kwargs):
+    """
+    Таблицы лидеров пишутся `bulk_create` и `QuerySet.update`
+    без сигналов моделей, поэтому версия меняется отдельным сигналом.
+    """
+    bump_generation_on_commit(sender)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def bump_genre_title_generation(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_generation_on_commit(sender)
@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.http import base36_to_int, int_to_base36
+
+
+class ConfirmationCodeGenerator:
+    """
+    Генератор кодов подтверждения для получения токена.
+
+    Код имеет вид `<время выпуска base36>-<HMAC>` и подписывается
+    SECRET_KEY, поэтому не хранится в базе: для проверки код
+    вычисляется заново по данным пользователя и времени из кода.
+    Код действителен CONFIRMATION_CODE_TIMEOUT секунд и перестает
+    подходить при смене email или пароля пользователя, а также после
+    выдачи по нему токена: ConfirmationAPIView обновляет `last_login`,
+    который входит в код.
+    """
+    key_salt = 'api.tokens.ConfirmationCodeGenerator'
+    hash_length = 12
+
+    @property
+    def timeout(self):
+        return settings.CONFIRMATION_CODE_TIMEOUT
+
+    def make_code(self, user):
+        return self._make_code_with_timestamp(user, self._now())
+
+    def check_code(self, user, code):
+        if not (user and code):
+            return False
+        try:
+            ts_b36, _ = code.split('-')
+            timestamp = base36_to_int(ts_b36)
+        except ValueError:
+            return False
+
+        if not constant_time_compare(
+            self._make_code_with_timestamp(user, timestamp), code
+        ):
+            return False
+        return 0 <= self._now() - timestamp <= self.timeout
+
+    def _make_code_with_timestamp(self, user, timestamp):
+        hash_string = salted_hmac(
+            self.key_salt,
+            self._make_hash_value(user, timestamp),
+            secret=settings.SECRET_KEY,
+        ).hexdigest()[:self.hash_length]
+        return f'{int_to_base36(timestamp)}-{hash_string}'
+
+    def _make_hash_value(self, user, timestamp):
+        login_timestamp = '' if user.last_login is None else (
+            user.last_login.replace(microsecond=0, tzinfo=None)
+        )
+        return (
+            f'{user.pk}{user.username}{user.email}{user.password}'
+            f'{login_timestamp}{timestamp}'
+        )
+
+    def _now(self):
+        return int(time.time())
+
+
+confirmation_code_generator = ConfirmationCodeGenerator()
@@ -1,9 +1,10 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework.routers import SimpleRouter
 
 from .views import (CategoryViewSet, CommentViewSet, ConfirmationAPIView,
-                    GenreViewSet, ReviewViewSet, TitleViewSet,
-                    UserCreateAPIView, UserViewSet)
+                    ExportAPIView, GenreViewSet, LeaderboardViewSet,
+                    ReviewViewSet, TitleViewSet, UserCreateAPIView,
+                    UserViewSet)
 
 app_name = 'api'
 
@@ -24,5 +25,15 @@ v1_router.register(
 urlpatterns = [
     path('v1/auth/signup/', UserCreateAPIView.as_view(), name='user_create'),
     path('v1/auth/token/', ConfirmationAPIView.as_view(), name='confirm_user'),
+    re_path(
+        r'^v1/leaderboards/(?P<kind>categories|genres)/(?P<slug>[-\w]+)/$',
+        LeaderboardViewSet.as_view({'get': 'list'}),
+        name='leaderboards-list'
+    ),
+    re_path(
+        r'^v1/export/(?P<name>titles|reviews|comments)/$',
+        ExportAPIView.as_view(),
+        name='export'
+    ),
     path('v1/', include(v1_router.urls)),
 ]
@@ -1,90 +1,228 @@
-from django.core.mail import send_mail
+from django.db import IntegrityError, connections, router, transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, permissions, status, viewsets
+from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
-from reviews.models import Category, Genre, Review, Title, User
+from reviews.exports import stream_export
+from reviews.leaderboards import GROUP_MODELS
+from reviews.models import (Category, Comment, EmailOutbox, Genre, GenreTitle,
+                            LeaderboardEntry, Review, Title, User)
 
-from .filters import TitleFilter
-from .mixins import CreateListDeleteMixinSet
+from .filters import (NullsLastOrderingFilter, TitleFilter,
+                      TrigramSearchFilter)
+from .mixins import (BulkCreateMixin, CachedResponseMixin,
+                     ConditionalGetMixin, CreateListDeleteMixinSet,
+                     NestedViewSetMixin)
+from .pagination import COUNT_ESTIMATE, PubDatePagination, TitlePagination
 from .permissions import (AdminOnlyPermission, AdminOrReadonly,
                           AuthorModeratorAdminOrReadOnly)
-from .serializers import (CategorySerializer, CommentSerializer,
-                          ConfirmationSerializer, GenreSerializer,
-                          ReviewSerializer, TitleSerializer,
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import (CategoryBulkSerializer, CategorySerializer,
+                          CommentSerializer, ConfirmationSerializer,
+                          GenreBulkSerializer, GenreSerializer,
+                          LeaderboardEntrySerializer, ReviewSerializer,
+                          TitleBulkSerializer, TitleSerializer,
                           UserCreateSerializer, UserSerializer)
+from .tokens import confirmation_code_generator
 
 
-class CategoryViewSet(CreateListDeleteMixinSet):
+class CategoryViewSet(
+        ConditionalGetMixin,
+        CachedResponseMixin,
+        BulkCreateMixin,
+        CreateListDeleteMixinSet):
     """Вью сет для работы с категориями произведений"""
     queryset = Category.objects.all()
+    cache_models = (Category,)
     serializer_class = CategorySerializer
+    bulk_serializer_class = CategoryBulkSerializer
     permission_classes = (AdminOrReadonly, )
-    filter_backends = (filters.SearchFilter,)
+    filter_backends = (TrigramSearchFilter,)
     search_fields = ('name',)
     lookup_field = 'slug'
 
 
-class GenreViewSet(CreateListDeleteMixinSet):
+class GenreViewSet(
+        ConditionalGetMixin,
+        CachedResponseMixin,
+        BulkCreateMixin,
+        CreateListDeleteMixinSet):
     """Вью сет для работы с жанрами произведений"""
     queryset = Genre.objects.all()
+    cache_models = (Genre,)
     serializer_class = GenreSerializer
+    bulk_serializer_class = GenreBulkSerializer
     permission_classes = (AdminOrReadonly, )
-    filter_backends = (filters.SearchFilter,)
+    filter_backends = (TrigramSearchFilter,)
     search_fields = ('name',)
     lookup_field = 'slug'
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(
+        ConditionalGetMixin,
+        CachedResponseMixin,
+        BulkCreateMixin,
+        viewsets.ModelViewSet):
     """Вью сет для работы с произведениями"""
-    queryset = Title.objects.all()
+    queryset = Title.objects.select_related(
+        'category'
+    ).prefetch_related('genre')
+    cache_models = (Title, Genre, Category, GenreTitle, Review)
     serializer_class = TitleSerializer
-    filter_backends = (DjangoFilterBackend, )
+    bulk_serializer_class = TitleBulkSerializer
+    filter_backends = (DjangoFilterBackend, NullsLastOrderingFilter)
     filterset_class = TitleFilter
+    ordering_fields = ('rating', 'year', 'name')
+    ordering = ('name', )
     permission_classes = (AdminOrReadonly, )
+    pagination_class = TitlePagination
 
+    def get_bulk_response_data(self, instances):
+        """Созданные произведения с жанрами и категорией"""
+        titles = self.get_queryset().filter(
+            pk__in=[title.pk for title in instances]
+        ).order_by('pk')
+        return self.get_serializer(titles, many=True).data
 
-class CommentViewSet(viewsets.ModelViewSet):
+
+class LeaderboardViewSet(
+        ConditionalGetMixin,
+        CachedResponseMixin,
+        mixins.ListModelMixin,
+        viewsets.GenericViewSet):
+    """
+    Вью сет для чтения таблиц лидеров: топ произведений по рейтингу
+    в категории или жанре. Таблица читается одним проходом
+    по индексу (kind, slug, position).
+    """
+    cache_models = (LeaderboardEntry, Genre, Category)
+    serializer_class = LeaderboardEntrySerializer
+    filter_backends = ()
+    pagination_class = None
+    kinds = {
+        'categories': LeaderboardEntry.CATEGORY,
+        'genres': LeaderboardEntry.GENRE,
+    }
+
+    def get_queryset(self):
+        return LeaderboardEntry.objects.filter(
+            kind=self.kinds[self.kwargs['kind']],
+            slug=self.kwargs['slug'],
+        ).order_by('position')
+
+    def filter_queryset(self, queryset):
+        """Для пустой таблицы проверяем, что категория или жанр есть"""
+        entries = list(queryset)
+        if not entries:
+            get_object_or_404(
+                GROUP_MODELS[self.kinds[self.kwargs['kind']]],
+                slug=self.kwargs['slug'],
+            )
+        return entries
+
+
+class ExportAPIView(APIView):
+    """
+    Выгрузка всех произведений, отзывов или комментариев одним
+    потоковым ответом, только для администратора.
+    Формат NDJSON (по умолчанию) или CSV выбирается заголовком
+    `Accept` или параметром `?format=csv`.
+    Строки читаются курсором на стороне сервера и отправляются
+    по мере чтения, см. reviews.exports.
+    """
+    permission_classes = (AdminOnlyPermission, )
+    renderer_classes = (NDJSONRenderer, CSVRenderer)
+
+    def get(self, request, name):
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            stream_export(name, renderer.format),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{name}.{renderer.format}"'
+        )
+        # nginx передает поток клиенту сразу, не собирая его целиком
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class CommentViewSet(
+        ConditionalGetMixin,
+        NestedViewSetMixin,
+        viewsets.ModelViewSet):
     """Вью сет для работы с комментариями к произведениям."""
+    cache_models = (Comment, User)
     serializer_class = CommentSerializer
     permission_classes = (AuthorModeratorAdminOrReadOnly, )
+    pagination_class = PubDatePagination
+    count_mode = COUNT_ESTIMATE
+    parent_model = Review
+    parent_lookups = {'review_id': 'pk', 'title_id': 'title_id'}
 
     def get_queryset(self):
-        review_id = self.kwargs.get('review_id')
-        review = get_object_or_404(Review, pk=review_id)
-        return review.comments.all()
+        self.check_parent()
+        return Comment.objects.filter(review_id=self.kwargs.get('review_id'))
 
     def perform_create(self, serializer):
-        review_id = self.kwargs.get('review_id')
-        review = get_object_or_404(Review, pk=review_id)
-        serializer.save(review=review, author=self.request.user)
+        self.check_parent()
+        serializer.save(
+            review_id=int(self.kwargs.get('review_id')),
+            author=self.request.user,
+        )
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(
+        ConditionalGetMixin,
+        NestedViewSetMixin,
+        viewsets.ModelViewSet):
     """Вью сет для работы с отзывами на произведения"""
+    cache_models = (Review, User)
     serializer_class = ReviewSerializer
     permission_classes = (AuthorModeratorAdminOrReadOnly, )
+    pagination_class = PubDatePagination
+    count_mode = COUNT_ESTIMATE
+    parent_model = Title
+    parent_lookups = {'title_id': 'pk'}
 
     def get_queryset(self):
-        title_id = self.kwargs.get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
-        return title.reviews.all()
+        self.check_parent()
+        return Review.objects.filter(title_id=self.kwargs.get('title_id'))
 
     def perform_create(self, serializer):
-        title_id = self.kwargs.get('title_id')
-        if self.request.user.reviews.filter(title=title_id).exists():
+        """
+        Отзыв создается одной вставкой: существование произведения
+        и единственность отзыва проверяют внешний ключ и ограничение
+        unique_title, поэтому параллельные запросы не получают 500.
+        """
+        try:
+            title_id = int(self.kwargs.get('title_id'))
+        except ValueError:
+            # Для id не из цифр check_parent отвечает 404 без запроса
+            self.check_parent()
+        try:
+            with transaction.atomic():
+                serializer.save(author=self.request.user, title_id=title_id)
+                # Внешний ключ отложен до коммита: проверяем его внутри
+                # точки сохранения, иначе во внешней транзакции
+                # (ATOMIC_REQUESTS) ошибка всплывет только при ее коммите
+                connections[router.db_for_write(Review)].check_constraints(
+                    table_names=[Review._meta.db_table]
+                )
+        except IntegrityError:
+            self.check_parent()
             raise ValidationError("Only one reviews in titles, sorry.")
 
-        title = get_object_or_404(Title, pk=title_id)
-        serializer.save(author=self.request.user, title=title)
-
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Вьюсет для модели User"""
+    cache_models = (User,)
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (AdminOnlyPermission, )
@@ -121,27 +259,27 @@ class UserViewSet(viewsets.ModelViewSet):
 
 class UserCreateAPIView(APIView):
     """
-    Класс для создания нового пользователя
+    Класс для создания нового пользователя.
+    Письмо с кодом подтверждения ставится в очередь `EmailOutbox`
+    в той же транзакции и отправляется командой send_outbox.
     """
     def post(self, request, *args, **kwargs):
         serializer = UserCreateSerializer(data=request.data)
         if serializer.is_valid():
-            if not User.objects.filter(
-                username=serializer.validated_data['username']
-            ).exists():
-                serializer.save(role='user')
-            user = User.objects.get(
-                username=serializer.validated_data['username']
-            )
-            user.confirmation_code = str(RefreshToken.for_user(user))
-            user.save(update_fields=['confirmation_code'])
-            send_mail(
-                'Confirmation code.',
-                user.confirmation_code,
-                'no_replay@yambd.ru',
-                [user.email, ],
-                fail_silently=False,
-            )
+            with transaction.atomic():
+                if not User.objects.filter(
+                    username=serializer.validated_data['username']
+                ).exists():
+                    serializer.save(role='user')
+                user = User.objects.get(
+                    username=serializer.validated_data['username']
+                )
+                EmailOutbox.objects.create(
+                    subject='Confirmation code.',
+                    body=confirmation_code_generator.make_code(user),
+                    from_email='no_replay@yambd.ru',
+                    to=user.email,
+                )
             return Response(
                 serializer.validated_data,
                 status=status.HTTP_200_OK,
@@ -152,15 +290,23 @@ class UserCreateAPIView(APIView):
 class ConfirmationAPIView(APIView):
     """
     Класс для получения токена по коду подтверждения `confirmation_code`.
+    Код проверяется без обращения к базе, см. api.tokens.
+    Код одноразовый: при выдаче токена обновляется `last_login`,
+    который входит в код.
     """
     def post(self, request, *args, **kwargs):
         serializer = ConfirmationSerializer(data=request.data)
         if serializer.is_valid():
-            user = User.objects.get(
-                username=serializer.validated_data['username']
-            )
-            user.confirmation_code = ''
-            user.save(update_fields=['confirmation_code'])
+            user = serializer.validated_data['user']
+            # Условное обновление: из параллельных запросов с одним
+            # кодом токен получает только первый
+            if not User.objects.filter(
+                pk=user.pk, last_login=user.last_login
+            ).update(last_login=timezone.now()):
+                return Response(
+                    {'confirmation_code': ['Неверный код подтверждения.']},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
             return Response(
                 {'token': str(RefreshToken.for_user(user).access_token)},
                 status=status.HTTP_200_OK
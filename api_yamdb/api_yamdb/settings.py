@@ -23,6 +23,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,6 +68,31 @@ DATABASES = {
     }
 }
 
+# Cache
+# Для нескольких процессов gunicorn нужен общий кэш, например
+# CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# CACHE_LOCATION=memcached:11211
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Количество воркеров gunicorn, gunicorn.conf.py передает его
+# в переменной окружения. С локальным кэшем и несколькими воркерами
+# кэш ответов API и ETag отключаются, см. api.cache
+GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', 1))
+
+# Время жизни кэша пользователя для JWT аутентификации в секундах
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Время жизни закэшированных ответов API в секундах
+API_RESPONSE_CACHE_TIMEOUT = 60
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -109,7 +135,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
@@ -122,6 +148,43 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=10),
 }
 
+# Время жизни кода подтверждения в секундах
+CONFIRMATION_CODE_TIMEOUT = 60 * 60
+
+# Количество попыток отправки письма из очереди EmailOutbox
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+
+# Количество мест в таблицах лидеров категорий и жанров
+LEADERBOARD_SIZE = 100
+
+# Метрики запросов: доля запросов с замером SQL и приемники метрик,
+# например {'BACKEND': 'api.metrics.StatsdSink',
+#           'OPTIONS': {'host': 'statsd', 'port': 8125}}
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('REQUEST_METRICS_SAMPLE_RATE', 0.1)
+)
+
+REQUEST_METRICS_SINKS = [
+    {'BACKEND': 'api.metrics.LogSink'},
+    {'BACKEND': 'api.prometheus.PrometheusSink'},
+]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.metrics': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_METRICS_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'mailing')
@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import TemplateView
 
+from api.prometheus import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path(
@@ -10,4 +12,5 @@ urlpatterns = [
         name='redoc'
     ),
     path('api/', include('api.urls', namespace='api')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,57 @@
+"""
+Настройки gunicorn.
+
+    Хуки считают воркеры и занятые запросами воркеры в метриках
+    Prometheus (yamdb_gunicorn_workers, yamdb_gunicorn_busy_workers),
+    их отношение - загрузка воркеров. Каталог PROMETHEUS_MULTIPROC_DIR
+    очищается при старте, файлы завершившихся воркеров помечаются
+    через mark_process_dead.
+"""
+import os
+import shutil
+
+from prometheus_client import Gauge, multiprocess
+
+bind = '0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+# Воркеры читают количество воркеров в settings.GUNICORN_WORKERS
+os.environ['GUNICORN_WORKERS'] = str(workers)
+# Потоковая выгрузка /api/v1/export/ занимает воркер на все время
+# передачи, для больших таблиц таймаут нужно увеличить
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+WORKERS = Gauge(
+    'yamdb_gunicorn_workers',
+    'Running gunicorn workers',
+    multiprocess_mode='livesum',
+)
+BUSY_WORKERS = Gauge(
+    'yamdb_gunicorn_busy_workers',
+    'Gunicorn workers handling a request',
+    multiprocess_mode='livesum',
+)
+
+
+def on_starting(server):
+    if MULTIPROC_DIR:
+        shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROC_DIR)
+
+
+def post_fork(server, worker):
+    WORKERS.inc()
+
+
+def pre_request(worker, req):
+    BUSY_WORKERS.inc()
+
+
+def post_request(worker, req, environ, resp):
+    BUSY_WORKERS.dec()
+
+
+def child_exit(server, worker):
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Category, Comment, Genre, GenreTitle, Review, Title, User
+from .models import (Category, Comment, EmailOutbox, Genre, GenreTitle,
+                     LeaderboardEntry, Review, Title, User)
 
 
 class UserAdmin(admin.ModelAdmin):
@@ -9,6 +10,18 @@ class UserAdmin(admin.ModelAdmin):
     search_fields = ('username', 'role', )
 
 
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('to', 'subject', 'created', 'attempts', 'sent_at', )
+    list_filter = ('sent_at', )
+    search_fields = ('to', )
+
+
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'slug', 'position', 'name', 'rating', )
+    list_filter = ('kind', )
+    search_fields = ('slug', )
+
+
 admin.site.register(User, UserAdmin)
 admin.site.register(Category)
 admin.site.register(Genre)
@@ -16,3 +29,5 @@ admin.site.register(Title)
 admin.site.register(GenreTitle)
 admin.site.register(Review)
 admin.site.register(Comment)
+admin.site.register(EmailOutbox, EmailOutboxAdmin)
+admin.site.register(LeaderboardEntry, LeaderboardEntryAdmin)
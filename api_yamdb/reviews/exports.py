@@ -0,0 +1,145 @@
+"""
+Потоковая выгрузка каталога: произведения, отзывы и комментарии.
+
+    Каждая выгрузка - заголовок (имена полей) и генератор строк.
+    Строки читаются курсором на стороне сервера
+    (`iterator(chunk_size=...)`) и кодируются в NDJSON или CSV
+    по одной, поэтому память не зависит от размера таблицы,
+    а количество запросов - от количества строк.
+
+    Выгрузки используются эндпоинтом /api/v1/export/<выгрузка>/
+    и management командой export_data.
+"""
+import csv
+import datetime
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, GenreTitle, Review, Title
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Закодированные строки отдаются частями примерно такого размера
+STREAM_BUFFER_SIZE = 64 * 1024
+
+TITLE_FIELDS = (
+    'id', 'name', 'year', 'description', 'category', 'genre', 'rating',
+    'review_count',
+)
+REVIEW_FIELDS = ('id', 'title_id', 'author', 'text', 'score', 'pub_date')
+COMMENT_FIELDS = (
+    'id', 'title_id', 'review_id', 'author', 'text', 'pub_date',
+)
+
+
+def export_titles(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Произведения с категорией, slug жанров и рейтингом.
+    Жанры читаются вторым курсором в том же порядке id произведений
+    и сливаются с произведениями на ходу, без запроса на произведение.
+    """
+    titles = Title.objects.order_by('pk').values_list(
+        'id', 'name', 'year', 'description', 'category__slug', 'rating',
+        'review_count',
+    ).iterator(chunk_size=chunk_size)
+    genres = groupby(
+        GenreTitle.objects.order_by('title_id', 'genre__slug').values_list(
+            'title_id', 'genre__slug'
+        ).iterator(chunk_size=chunk_size),
+        key=itemgetter(0),
+    )
+    genre_title_id, genre_rows = next(genres, (None, ()))
+    for title_id, name, year, description, category, rating, count in titles:
+        while genre_title_id is not None and genre_title_id < title_id:
+            genre_title_id, genre_rows = next(genres, (None, ()))
+        slugs = []
+        if genre_title_id == title_id:
+            slugs = [slug for _, slug in genre_rows]
+        if rating is not None:
+            rating = round(rating)
+        yield (
+            title_id, name, year, description, category, slugs, rating,
+            count,
+        )
+
+
+def export_reviews(chunk_size=EXPORT_CHUNK_SIZE):
+    """Отзывы с именем автора."""
+    return Review.objects.order_by('pk').values_list(
+        'id', 'title_id', 'author__username', 'text', 'score', 'pub_date'
+    ).iterator(chunk_size=chunk_size)
+
+
+def export_comments(chunk_size=EXPORT_CHUNK_SIZE):
+    """Комментарии с id отзыва и произведения."""
+    return Comment.objects.order_by('pk').values_list(
+        'id', 'review__title_id', 'review_id', 'author__username', 'text',
+        'pub_date',
+    ).iterator(chunk_size=chunk_size)
+
+
+EXPORTS = {
+    'titles': (TITLE_FIELDS, export_titles),
+    'reviews': (REVIEW_FIELDS, export_reviews),
+    'comments': (COMMENT_FIELDS, export_comments),
+}
+
+
+def buffered(lines, size=STREAM_BUFFER_SIZE):
+    """Склеивает строки в части по `size` байт."""
+    chunk = []
+    length = 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield b''.join(chunk)
+            chunk = []
+            length = 0
+    if chunk:
+        yield b''.join(chunk)
+
+
+def ndjson_lines(fields, rows):
+    """Строки в формате NDJSON: JSON объект на строку."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield (encoder.encode(dict(zip(fields, row))) + '\n').encode()
+
+
+class LineWriter:
+    """Файл для `csv.writer`, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_value(value):
+    if isinstance(value, list):
+        return ','.join(value)
+    if isinstance(value, datetime.datetime):
+        # Даты в том же виде, что и в NDJSON
+        return DjangoJSONEncoder().default(value)
+    return value
+
+
+def csv_lines(fields, rows):
+    """Строки в формате CSV с заголовком, списки - через запятую."""
+    writer = csv.writer(LineWriter())
+    yield writer.writerow(fields).encode()
+    for row in rows:
+        yield writer.writerow([csv_value(value) for value in row]).encode()
+
+
+FORMATS = {
+    'ndjson': ndjson_lines,
+    'csv': csv_lines,
+}
+
+
+def stream_export(name, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """Выгрузка `name` в формате `export_format` частями байтов."""
+    fields, export = EXPORTS[name]
+    return buffered(FORMATS[export_format](fields, export(chunk_size)))
@@ -0,0 +1,294 @@
+"""
+Таблицы лидеров: топ LEADERBOARD_SIZE произведений по рейтингу
+в каждой категории и каждом жанре.
+
+    Таблица хранится в LeaderboardEntry. Если произведение уже
+    в таблице и его место не меняется (рейтинг остался между соседями),
+    его строка обновляется на месте одним UPDATE. Целиком (удаление
+    и вставка не больше LEADERBOARD_SIZE строк) таблица перестраивается,
+    только если места могут поменяться, и уже после коммита транзакции,
+    изменившей произведение. Отзывы на непопулярные произведения
+    обходятся одним запросом проверки.
+
+    Обновление вызывается обработчиками сигналов reviews.signals
+    после коммита, один раз на произведение в транзакции.
+    После записи в таблицу отправляется сигнал `leaderboard_changed`.
+    Изменения в обход сигналов (`QuerySet.update`, загрузка данных)
+    исправляет management команда refresh_leaderboards.
+"""
+from threading import local
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.dispatch import Signal
+
+from .models import Category, Genre, LeaderboardEntry, Title
+
+# Поля произведения, скопированные в строку таблицы
+ENTRY_FIELDS = ('id', 'name', 'year', 'rating', 'review_count')
+
+GROUP_MODELS = {
+    LeaderboardEntry.CATEGORY: Category,
+    LeaderboardEntry.GENRE: Genre,
+}
+
+# Запись в таблицу лидеров: перестройка или обновление строки
+leaderboard_changed = Signal(providing_args=['kind', 'slug'])
+
+# Отложенные до коммита обновления, отдельно для каждого потока
+_scheduled = local()
+
+
+def ranked_titles(kind, group_id):
+    """
+    Произведения группы по убыванию рейтинга.
+    Для категорий порядок совпадает с индексом title_category_rating_id.
+    Произведения жанра читаются по индексу genretitle_genre_title
+    и сортируются, поэтому перестройка таблицы жанра дороже
+    и выполняется только после коммита (schedule_rebuild).
+    """
+    titles = Title.objects.filter(rating__isnull=False)
+    if kind == LeaderboardEntry.CATEGORY:
+        titles = titles.filter(category_id=group_id)
+    else:
+        titles = titles.filter(genretitles__genre_id=group_id)
+    return titles.order_by(F('rating').desc(nulls_last=True), 'id')
+
+
+def rebuild_leaderboard(kind, slug):
+    """Перестраивает таблицу лидеров категории или жанра."""
+    with transaction.atomic(savepoint=False):
+        # Блокировка группы не дает двум перестройкам одной таблицы
+        # нарушить уникальность (kind, slug, position)
+        group = GROUP_MODELS[kind].objects.select_for_update().filter(
+            slug=slug
+        ).first()
+        LeaderboardEntry.objects.filter(kind=kind, slug=slug).delete()
+        if group is None:
+            return 0
+        titles = ranked_titles(kind, group.pk).values_list(
+            *ENTRY_FIELDS
+        )[:settings.LEADERBOARD_SIZE]
+        entries = LeaderboardEntry.objects.bulk_create(
+            LeaderboardEntry(
+                kind=kind, slug=slug, position=position, title_id=title_id,
+                name=name, year=year, rating=rating,
+                review_count=review_count,
+            )
+            for position, (title_id, name, year, rating, review_count)
+            in enumerate(titles, start=1)
+        )
+    leaderboard_changed.send(LeaderboardEntry, kind=kind, slug=slug)
+    return len(entries)
+
+
+def scheduled(name):
+    """Отложенные до коммита обновления: 'refresh' или 'rebuild'."""
+    return _scheduled.__dict__.setdefault(name, set())
+
+
+def schedule_refresh(title_id):
+    """
+    Обновляет таблицы произведения после коммита текущей транзакции,
+    вне транзакции - сразу. Каскадное удаление отзывов пользователя
+    обновляет таблицы один раз на произведение, а не на каждый отзыв.
+    """
+    scheduled('refresh').add(title_id)
+    transaction.on_commit(run_scheduled)
+
+
+def schedule_rebuild(kind, slug):
+    """
+    Перестраивает таблицу после коммита текущей транзакции, чтобы
+    блокировка группы и перестройка не удлиняли транзакцию отзыва.
+    """
+    scheduled('rebuild').add((kind, slug))
+    transaction.on_commit(run_scheduled)
+
+
+def run_scheduled():
+    """
+    Выполняет отложенные обновления одной транзакцией: сначала
+    обновления произведений, затем перестройку таблиц, каждой один раз
+    и в порядке (kind, slug), чтобы блокировки групп брались
+    в одном порядке. Отложенное в откаченной транзакции выполняется
+    со следующим коммитом, лишнее обновление ничего не портит.
+    """
+    refresh, rebuild = scheduled('refresh'), scheduled('rebuild')
+    if not (refresh or rebuild):
+        # Уже выполнено более ранним вызовом после этого коммита
+        return
+    with transaction.atomic():
+        while refresh:
+            refresh_title_leaderboards(refresh.pop())
+        while rebuild:
+            board = min(rebuild)
+            rebuild.discard(board)
+            rebuild_leaderboard(*board)
+
+
+def rebuild_all_leaderboards():
+    """Перестраивает все таблицы лидеров, возвращает количество строк."""
+    prune_leaderboards()
+    total = 0
+    for kind, model in GROUP_MODELS.items():
+        for slug in model.objects.order_by('pk').values_list(
+            'slug', flat=True
+        ):
+            total += rebuild_leaderboard(kind, slug)
+    return total
+
+
+def prune_leaderboards():
+    """Удаляет таблицы удаленных групп и групп со смененным slug."""
+    for kind, model in GROUP_MODELS.items():
+        LeaderboardEntry.objects.filter(kind=kind).exclude(
+            slug__in=model.objects.values('slug')
+        ).delete()
+
+
+def title_leaderboards(title_id):
+    """Таблицы лидеров, в которых есть произведение."""
+    return set(
+        LeaderboardEntry.objects.filter(title_id=title_id).values_list(
+            'kind', 'slug'
+        )
+    )
+
+
+def title_groups(title_id, category_slug):
+    """Категория и жанры произведения в виде таблиц лидеров."""
+    groups = {
+        (LeaderboardEntry.GENRE, slug)
+        for slug in Genre.objects.filter(
+            genretitles__title_id=title_id
+        ).values_list('slug', flat=True)
+    }
+    if category_slug is not None:
+        groups.add((LeaderboardEntry.CATEGORY, category_slug))
+    return groups
+
+
+def in_boards(boards):
+    """Условие на строки таблиц лидеров из `boards`."""
+    condition = Q(pk__in=[])
+    for kind, slug in boards:
+        condition |= Q(kind=kind, slug=slug)
+    return condition
+
+
+def board_neighbours(places):
+    """
+    Ключи сортировки соседних мест: {таблица: {место: ключ}}
+    для мест `places` вида {таблица: (место, ...)}.
+    """
+    condition = Q(pk__in=[])
+    for (kind, slug), (position, *_) in places.items():
+        condition |= Q(
+            kind=kind, slug=slug, position__in=(position - 1, position + 1)
+        )
+    neighbours = {}
+    for kind, slug, position, title_id, rating in (
+        LeaderboardEntry.objects.filter(condition).values_list(
+            'kind', 'slug', 'position', 'title_id', 'rating'
+        )
+    ):
+        neighbours.setdefault((kind, slug), {})[position] = (
+            rating, -title_id
+        )
+    return neighbours
+
+
+def keeps_position(title, position, old_rating, neighbours):
+    """
+    Остается ли произведение на месте `position` с новым рейтингом:
+    ниже предыдущего места и выше следующего. `neighbours` - ключи
+    сортировки соседних мест таблицы.
+    """
+    current = (title['rating'], -title['id'])
+    above = neighbours.get(position - 1)
+    below = neighbours.get(position + 1)
+    if above is not None and current > above:
+        return False
+    if below is not None and current < below:
+        return False
+    # С последнего места заполненной таблицы произведение со сниженным
+    # рейтингом может вытеснить произведение не из таблицы
+    return (
+        position < settings.LEADERBOARD_SIZE or title['rating'] > old_rating
+    )
+
+
+def changed_leaderboards(title, groups):
+    """
+    Таблицы, которые затрагивает изменение произведения.
+    Возвращает пару множеств: таблицы, где достаточно обновить строку
+    произведения, и таблицы, которые нужно перестроить, потому что
+    место произведения может поменяться, оно выбыло из группы
+    или его рейтинг выше последнего места.
+    """
+    size = settings.LEADERBOARD_SIZE
+    entries = LeaderboardEntry.objects.filter(
+        Q(title_id=title['id']) | (in_boards(groups) & Q(position=size))
+    ).values_list('kind', 'slug', 'position', 'title_id', *ENTRY_FIELDS[1:])
+
+    current = tuple(title[field] for field in ENTRY_FIELDS)
+    update, rebuild = set(), set()
+    moved = {}
+    last_places = {}
+    for kind, slug, position, *entry in entries:
+        entry = tuple(entry)
+        if entry[0] == title['id']:
+            if (kind, slug) not in groups:
+                rebuild.add((kind, slug))
+            elif entry[3] != title['rating']:
+                moved[kind, slug] = (position, entry[3])
+            elif entry != current:
+                update.add((kind, slug))
+            groups = groups - {(kind, slug)}
+        if position == size:
+            last_places[kind, slug] = (entry[3], -entry[0])
+
+    # Незаполненная таблица без последнего места: любой ключ больше ()
+    rebuild |= {
+        group for group in groups
+        if (title['rating'], -title['id']) > last_places.get(group, ())
+    }
+
+    if moved:
+        neighbours = board_neighbours(moved)
+        for board, (position, rating) in moved.items():
+            places = neighbours.get(board, {})
+            if keeps_position(title, position, rating, places):
+                update.add(board)
+            else:
+                rebuild.add(board)
+    return update, rebuild
+
+
+def refresh_title_leaderboards(title_id):
+    """
+    Обновляет таблицы лидеров, в которых произведение есть
+    или в которые оно может попасть после изменения.
+    """
+    title = Title.objects.filter(pk=title_id).values(
+        *ENTRY_FIELDS, 'category__slug'
+    ).first()
+    if title is None:
+        return
+    if title['rating'] is None:
+        # Без рейтинга произведение может только выбыть из таблиц
+        update, rebuild = set(), title_leaderboards(title_id)
+    else:
+        update, rebuild = changed_leaderboards(
+            title, title_groups(title_id, title['category__slug'])
+        )
+    if update:
+        LeaderboardEntry.objects.filter(
+            in_boards(update), title_id=title_id
+        ).update(**{field: title[field] for field in ENTRY_FIELDS[1:]})
+        for kind, slug in sorted(update):
+            leaderboard_changed.send(LeaderboardEntry, kind=kind, slug=slug)
+    for kind, slug in rebuild:
+        schedule_rebuild(kind, slug)
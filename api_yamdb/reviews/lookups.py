@@ -0,0 +1,26 @@
+from django.db.models import CharField
+from django.db.models.lookups import IContains
+
+
+@CharField.register_lookup
+class TrigramIContains(IContains):
+    """
+    Поиск подстроки без учета регистра, который может использовать
+    trigram индекс (`gin_trgm_ops`) на PostgreSQL.
+
+    Стандартный `icontains` на PostgreSQL строится как
+    `UPPER(поле) LIKE UPPER(%s)` и индекс по полю не использует,
+    поэтому здесь сравнение делается через `поле ILIKE %s`.
+    На остальных базах данных работает как `icontains`.
+    """
+    lookup_name = 'trgm_icontains'
+
+    def as_sql(self, compiler, connection):
+        return IContains(self.lhs, self.rhs).as_sql(compiler, connection)
+
+    def as_postgresql(self, compiler, connection):
+        if not self.rhs_is_direct_value() or self.bilateral_transforms:
+            return self.as_sql(compiler, connection)
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs_sql} ILIKE {rhs_sql}', lhs_params + rhs_params
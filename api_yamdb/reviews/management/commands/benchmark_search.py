@@ -0,0 +1,93 @@
+"""
+Модуль benchmark_search сравнивает время поиска произведений по названию.
+
+    Для каждого размера из --sizes создает нужное количество произведений
+    со случайными названиями, выполняет поиск стандартным lookup
+    (`icontains`, `contains`) и lookup `trgm_icontains`, который на
+    PostgreSQL использует trigram индекс, и выводит медианное время.
+    Все созданные данные откатываются в конце каждого прогона.
+
+    python manage.py benchmark_search
+    python manage.py benchmark_search --sizes 10000 100000 --repeat 20
+
+    Note:
+        На SQLite оба lookup выполняются одинаковым `LIKE`,
+        разница во времени показательна только на PostgreSQL.
+"""
+import random
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from reviews.models import Title
+
+BATCH_SIZE = 10000
+LOOKUPS = ('icontains', 'trgm_icontains', 'contains')
+
+
+class Rollback(Exception):
+    """Исключение для отката данных прогона."""
+
+
+def random_name(rnd):
+    words = (
+        ''.join(rnd.choices(string.ascii_lowercase, k=rnd.randint(3, 10)))
+        for _ in range(rnd.randint(1, 4))
+    )
+    return ' '.join(words).capitalize()
+
+
+class Command(BaseCommand):
+    """Класс для замера времени поиска произведений"""
+    help = 'Compares title name search latency on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int,
+            default=[10000, 100000, 1000000],
+        )
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.run(size, options['repeat'], options['seed'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def seed(self, size, rnd):
+        for start in range(0, size, BATCH_SIZE):
+            Title.objects.bulk_create(
+                Title(name=random_name(rnd), year=2000)
+                for _ in range(min(BATCH_SIZE, size - start))
+            )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE "{Title._meta.db_table}"')
+
+    def run(self, size, repeat, seed):
+        rnd = random.Random(seed)
+        self.seed(size, rnd)
+        terms = [
+            ''.join(rnd.choices(string.ascii_lowercase, k=3))
+            for _ in range(repeat)
+        ]
+
+        for lookup in LOOKUPS:
+            timings = []
+            for term in terms:
+                queryset = Title.objects.filter(**{f'name__{lookup}': term})
+                started = time.perf_counter()
+                list(queryset.values_list('pk', flat=True)[:10])
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f'titles={size:<8} lookup={lookup:<15} '
+                f'median={statistics.median(timings):.2f}ms '
+                f'max={max(timings):.2f}ms'
+            )
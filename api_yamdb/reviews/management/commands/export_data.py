@@ -0,0 +1,59 @@
+"""
+Модуль export_data выгружает произведения, отзывы или комментарии
+в NDJSON или CSV, как эндпоинт /api/v1/export/<выгрузка>/.
+
+    python manage.py export_data titles
+    python manage.py export_data reviews --format csv --output reviews.csv
+
+    Без --output выгрузка пишется в stdout. Строки читаются курсором
+    на стороне сервера частями по --chunk-size, память не зависит
+    от размера таблицы.
+"""
+from django.core.management.base import BaseCommand
+
+from reviews.exports import EXPORT_CHUNK_SIZE, EXPORTS, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    """Класс для выгрузки каталога"""
+    help = 'Streams titles, reviews or comments as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=tuple(EXPORTS))
+        parser.add_argument(
+            '--format',
+            dest='export_format',
+            choices=tuple(FORMATS),
+            default='ndjson',
+            help='Output format, ndjson by default',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write, stdout by default',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Rows fetched from the database cursor at a time',
+        )
+
+    def handle(self, *args, **options):
+        chunks = stream_export(
+            options['name'], options['export_format'], options['chunk_size']
+        )
+        if options['output'] is None:
+            for chunk in chunks:
+                # Части заканчиваются на границе строки, utf-8 не рвется
+                self.stdout.write(chunk.decode(), ending='')
+            return
+
+        with open(options['output'], 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+        self.stderr.write(
+            self.style.SUCCESS(
+                f'Successfully exported {options["name"]} '
+                f'to {options["output"]}.'
+            )
+        )
@@ -0,0 +1,376 @@
+"""
+Модуль generate_data создает синтетические данные для нагрузочного
+тестирования.
+
+    Генерирует пользователей, категории, жанры, произведения, связи
+    жанров с произведениями, отзывы и комментарии в заданных объемах
+    с неравномерным распределением, похожим на реальное:
+
+    - отзывы распределяются по произведениям по закону Ципфа
+      (параметр --skew), у популярных произведений тысячи отзывов,
+      у большинства единицы. Один пользователь пишет не больше
+      одного отзыва на произведение;
+    - количество комментариев к отзыву имеет распределение Парето;
+    - популярность жанров и категорий тоже подчиняется закону Ципфа,
+      у произведения от одного до четырех жанров;
+    - оценки смещены к высоким, даты распределены за последние
+      --days дней, комментарий всегда позже отзыва.
+
+    При одинаковых --seed, --end-date и объемах данные получаются
+    одинаковыми.
+
+    python manage.py generate_data --reviews 1000000 --comments 3000000
+    python manage.py generate_data --output /tmp/data
+    python manage.py initdata --data-dir /tmp/data --fast
+
+    Без --output данные записываются прямо в базу через `bulk_create`
+    частями по --batch-size строк, id продолжают уже существующие.
+    С --output в каталог пишутся csv файлы в формате `initdata`.
+
+    Note:
+        Для распределения комментариев в памяти держится список
+        размером с количество отзывов.
+"""
+import csv
+import datetime
+import os
+import random
+from array import array
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from reviews.management.commands.initdata import (get_columns, get_model,
+                                                  get_model_csv_name,
+                                                  ordered_load_models,
+                                                  read_chunks,
+                                                  reset_sequences)
+from reviews.leaderboards import rebuild_all_leaderboards
+from reviews.models import User
+
+BATCH_SIZE = 10000
+
+MAX_GENRES_PER_TITLE = 4
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+count_options = (
+    'users', 'categories', 'genres', 'titles', 'reviews', 'comments'
+)
+
+# Заголовки csv файлов, как в static/data
+model_columns = {
+    'User': ('id', 'username', 'email', 'role', 'bio', 'first_name',
+             'last_name'),
+    'Category': ('id', 'name', 'slug'),
+    'Genre': ('id', 'name', 'slug'),
+    'Title': ('id', 'name', 'year', 'category'),
+    'GenreTitle': ('id', 'title_id', 'genre_id'),
+    'Review': ('id', 'title_id', 'text', 'author', 'score', 'pub_date'),
+    'Comment': ('id', 'review_id', 'text', 'author', 'pub_date'),
+}
+
+# Оценки 1..10, высокие встречаются чаще
+scores = range(1, 11)
+score_cum_weights = list(accumulate((2, 1, 1, 2, 3, 5, 8, 12, 10, 8)))
+
+words = (
+    'фильм книга песня сюжет герой финал автор режиссер музыка роль '
+    'актер сцена история смысл жанр классика шедевр провал вечер '
+    'отлично скучно сильно неожиданно красиво долго смешно грустно '
+    'советую пересмотреть перечитать спорно атмосфера диалоги ритм'
+).split()
+
+
+def zipf_weights(count, skew, rnd):
+    """
+    Веса по закону Ципфа 1 / rank ** skew.
+    Ранги перемешаны, чтобы популярность не зависела от id.
+    """
+    ranks = list(range(1, count + 1))
+    rnd.shuffle(ranks)
+    return [1 / rank ** skew for rank in ranks]
+
+
+def split_total(total, weights, cap=None):
+    """
+    Распределяем total пропорционально весам, не больше cap на элемент.
+    Остаток от округления достается самым тяжелым элементам.
+    """
+    scale = total / sum(weights) if weights else 0
+    counts = [int(weight * scale) for weight in weights]
+    if cap is not None:
+        counts = [min(count, cap) for count in counts]
+
+    remainder = total - sum(counts)
+    order = sorted(range(len(weights)), key=weights.__getitem__, reverse=True)
+    while remainder > 0:
+        given = 0
+        for index in order:
+            if remainder == given:
+                break
+            if cap is None or counts[index] < cap:
+                counts[index] += 1
+                given += 1
+        if not given:
+            raise CommandError(f'Can`t place {remainder} more rows')
+        remainder -= given
+    return counts
+
+
+def random_text(rnd, low, high):
+    return ' '.join(rnd.choices(words, k=rnd.randint(low, high))).capitalize()
+
+
+class CsvWriter:
+    """Пишет строки моделей в csv файлы для `initdata --data-dir`."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def first_id(self, model):
+        return 1
+
+    def write(self, model, rows):
+        path = os.path.join(
+            self.directory, get_model_csv_name(model.__name__)
+        )
+        count = 0
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(model_columns[model.__name__])
+            for row in rows:
+                writer.writerow(
+                    value.strftime(DATE_FORMAT)
+                    if isinstance(value, datetime.datetime) else value
+                    for value in row
+                )
+                count += 1
+        return count
+
+
+class DatabaseWriter:
+    """Пишет строки моделей в базу через `bulk_create`."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def first_id(self, model):
+        return (model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+
+    def write(self, model, rows):
+        columns = get_columns(model, model_columns[model.__name__])
+        count = 0
+        for chunk in read_chunks(rows, self.batch_size):
+            objs = [
+                model(**{
+                    field.attname: value
+                    for (field, _), value in zip(columns, row)
+                })
+                for row in chunk
+            ]
+            with transaction.atomic():
+                model.objects.bulk_create(objs)
+            count += len(objs)
+        reset_sequences(model)
+        return count
+
+
+class Command(BaseCommand):
+    """Класс для генерации синтетических данных"""
+    help = 'Generates skewed synthetic data for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--genres', type=int, default=30)
+        parser.add_argument('--titles', type=int, default=10000)
+        parser.add_argument('--reviews', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Zipf exponent of title and genre popularity',
+        )
+        parser.add_argument('--days', type=int, default=3 * 365)
+        parser.add_argument(
+            '--end-date', type=datetime.date.fromisoformat,
+            default=datetime.date.today(),
+            help='Latest pub_date, YYYY-MM-DD (default: today)',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--output',
+            help='Write csv files for initdata to this directory '
+                 'instead of the database',
+        )
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options['seed'])
+        self.options = options
+        self.now = datetime.datetime.combine(
+            options['end_date'], datetime.time(), tzinfo=datetime.timezone.utc
+        )
+        self.check_options()
+
+        if options['output']:
+            self.writer = CsvWriter(options['output'])
+        else:
+            self.writer = DatabaseWriter(options['batch_size'])
+
+        self.first_ids = {}
+        for name in ordered_load_models:
+            model = get_model(name)
+            self.first_ids[name] = self.writer.first_id(model)
+            count = self.writer.write(
+                model, getattr(self, f'generate_{name.lower()}')()
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f'Generated {count} rows of `{name}`.')
+            )
+
+        if not options['output']:
+            get_model('Title').objects.recalculate_ratings()
+            self.stdout.write(
+                self.style.SUCCESS('Successfully recalculate title ratings.')
+            )
+            rows = rebuild_all_leaderboards()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Successfully rebuilt {rows} leaderboard rows.'
+                )
+            )
+
+    def check_options(self):
+        options = self.options
+        if any(options[name] < 0 for name in count_options):
+            raise CommandError('Row counts must not be negative')
+        if options['titles'] and not options['categories']:
+            raise CommandError('--titles requires --categories')
+        if options['reviews'] and not (options['users']
+                                       and options['titles']):
+            raise CommandError('--reviews requires --users and --titles')
+        if options['reviews'] > options['users'] * options['titles']:
+            raise CommandError(
+                'One user writes one review per title: '
+                '--reviews must not exceed --users * --titles'
+            )
+        if options['comments'] and not options['reviews']:
+            raise CommandError('--comments requires --reviews')
+
+    def ids(self, name, count):
+        first = self.first_ids[name]
+        return range(first, first + count)
+
+    def random_date(self, after=None):
+        start = after or self.now - datetime.timedelta(
+            days=self.options['days']
+        )
+        seconds = max((self.now - start).total_seconds(), 1)
+        return start + datetime.timedelta(
+            seconds=self.rnd.uniform(0, seconds)
+        )
+
+    def generate_user(self):
+        for user_id in self.ids('User', self.options['users']):
+            role = self.rnd.choices(
+                (User.USER, User.MODERATOR, User.ADMIN), (989, 10, 1)
+            )[0]
+            yield (
+                user_id, f'gen_user{user_id}', f'gen_user{user_id}@yamdb.fake',
+                role, '', '', '',
+            )
+
+    def generate_category(self):
+        for category_id in self.ids('Category', self.options['categories']):
+            yield (
+                category_id, f'Категория {category_id}',
+                f'gen-category-{category_id}',
+            )
+
+    def generate_genre(self):
+        for genre_id in self.ids('Genre', self.options['genres']):
+            yield genre_id, f'Жанр {genre_id}', f'gen-genre-{genre_id}'
+
+    def generate_title(self):
+        category_ids = list(self.ids('Category', self.options['categories']))
+        cum_weights = list(accumulate(zipf_weights(
+            len(category_ids), self.options['skew'], self.rnd
+        )))
+        last_year = self.now.year - 1
+        for title_id in self.ids('Title', self.options['titles']):
+            year = max(1900, last_year - int(self.rnd.expovariate(1 / 15)))
+            yield (
+                title_id, random_text(self.rnd, 1, 4), year,
+                self.rnd.choices(category_ids, cum_weights=cum_weights)[0],
+            )
+
+    def generate_genretitle(self):
+        genre_ids = list(self.ids('Genre', self.options['genres']))
+        if not genre_ids:
+            return
+        cum_weights = list(accumulate(
+            zipf_weights(len(genre_ids), self.options['skew'], self.rnd)
+        ))
+        row_id = self.first_ids['GenreTitle']
+        for title_id in self.ids('Title', self.options['titles']):
+            count = self.rnd.randint(
+                1, min(MAX_GENRES_PER_TITLE, len(genre_ids))
+            )
+            genres = set()
+            while len(genres) < count:
+                genres.add(
+                    self.rnd.choices(genre_ids, cum_weights=cum_weights)[0]
+                )
+            for genre_id in sorted(genres):
+                yield row_id, title_id, genre_id
+                row_id += 1
+
+    def generate_review(self):
+        title_ids = self.ids('Title', self.options['titles'])
+        user_ids = self.ids('User', self.options['users'])
+        counts = split_total(
+            self.options['reviews'],
+            zipf_weights(len(title_ids), self.options['skew'], self.rnd),
+            cap=len(user_ids),
+        )
+        # Даты отзывов нужны комментариям, храним их компактно
+        self.review_dates = array('d')
+        review_id = self.first_ids['Review']
+        for title_id, count in zip(title_ids, counts):
+            for author_id in self.rnd.sample(user_ids, count):
+                pub_date = self.random_date()
+                self.review_dates.append(pub_date.timestamp())
+                score = self.rnd.choices(
+                    scores, cum_weights=score_cum_weights
+                )[0]
+                yield (
+                    review_id, title_id, random_text(self.rnd, 3, 60),
+                    author_id, score, pub_date,
+                )
+                review_id += 1
+
+    def generate_comment(self):
+        if not self.options['comments']:
+            return
+        user_ids = self.ids('User', self.options['users'])
+        counts = split_total(
+            self.options['comments'],
+            [self.rnd.paretovariate(1.5) for _ in self.review_dates],
+        )
+        comment_id = self.first_ids['Comment']
+        review_id = self.first_ids['Review']
+        for timestamp, count in zip(self.review_dates, counts):
+            review_date = datetime.datetime.fromtimestamp(
+                timestamp, tz=datetime.timezone.utc
+            )
+            for _ in range(count):
+                yield (
+                    comment_id, review_id, random_text(self.rnd, 2, 30),
+                    self.rnd.choice(user_ids), self.random_date(review_date),
+                )
+                comment_id += 1
+            review_id += 1
@@ -19,6 +19,13 @@
         что модель `Comment` имеет обязательное поле User, которое
         она не сможет получить в силу пустой таблицы `User`.
 
+        Порядок строится автоматически по графу внешних ключей моделей.
+        Независимые друг от друга модели (например `User`, `Category` и
+        `Genre`) загружаются одновременно в пуле из --workers потоков,
+        каждый со своим соединением с базой. Модель начинает загружаться,
+        как только загружены все модели, от которых она зависит.
+        На SQLite загрузка всегда последовательная.
+
     -- с параметром --models
 
     python manage.py initdata --models User Genre Category
@@ -27,25 +34,32 @@
     через пробел. Допускается указание одной модели.
 
     Note:
-        Порядок загрузки определяет пользователь. Подходит для ручной
-        перезагрузки моделей. Можно очистить руками таблицу базы данных и
-        загрузить заново в нее данные по средствам команды описанной выше.
+        Зависимости учитываются только между перечисленными моделями,
+        остальные связанные модели должны быть уже загружены. Подходит
+        для ручной перезагрузки моделей. Можно очистить руками таблицу
+        базы данных и загрузить заново в нее данные по средствам команды
+        описанной выше.
+
+    По умолчанию файлы берутся из DATA_DIR, другой каталог (например,
+    созданный командой generate_data) задается параметром --data-dir.
+
+    Файлы читаются потоково, частями по --chunk-size строк. Каждая часть
+    записывается в отдельной транзакции: существующие по id строки
+    обновляются через `bulk_update`, новые создаются через `bulk_create`.
+    Связанные модели разрешаются по словарю id -> pk, который загружается
+    одним запросом на каждую связанную модель.
 
     Attributes
     ----------
-    STATICFILES_DIRS : str
-        какталог для статических файлов проекта
-    MODELS_MODULE_NAME : str
-        название модуля с моделями
+    DATA_DIR : str
+        каталог с csv файлами данных
+    CHUNK_SIZE : int
+        количество строк файла, записываемых в базу за одну транзакцию
     model_file_link : dict
         словарь связей модели с загружаемым файлом
         key : название модели
         val: название файла хранения данных
 
-    model_fields_link: dict
-        справочник для ручной связи полей модели с полем файла загрузки данных
-        если связь не найдена, модуль пытается разрешить ее один в один.
-
     date_name_fields: list
         список имен полей в моделях, которые надо обрабатывать как поля даты
     ordered_load_models: tuple
@@ -57,29 +71,76 @@
     get_model(model_name)
         Получает модель по имени из коммандной строки или из кортежа
 
-    get_model_csv_filename(name)
-        получает имя файла для загрузки модели.
+    get_model_csv_name(name)
+        получает имя csv файла модели.
+
+    get_model_csv_filename(name, data_dir)
+        получает путь к файлу для загрузки модели из каталога data_dir.
+
+    get_columns(model, headers)
+        сопоставляет заголовок csv файла полям модели. Для полей
+        связанных моделей запоминает связанную модель.
+
+    check_required_columns(model, columns)
+        проверяет, что в csv файле есть колонки всех полей, которые
+        иначе получили бы NULL (нет значения по умолчанию и null=False).
 
-    create_kwargs(headers, row)
-        получает заголовок csv файла с именами полей и текущую строку
-        со значениями. Если заголовок поля файла это модель, то получает
-        значение связанной модели, елси дата, то преобразует в формат
-        datetime.datetime.
+    load_pk_map(model)
+        получает словарь id -> pk для связанной модели.
+
+    create_kwargs(columns, row, pk_maps)
+        получает описание колонок и текущую строку со значениями.
+        Если поле связано с моделью, то получает pk связанной модели
+        по словарю, елси дата, то преобразует в формат datetime.datetime.
 
         Возвращает словарь, где ключи соответствуют названиям полей модели,
         а значения значениям для загрузки в модель.
+
+    save_chunk(model, objs, fields)
+        записывает часть строк файла в базу в одной транзакции.
+
+    get_dependencies(models)
+        строит граф зависимостей моделей по внешним ключам.
+
+    get_load_order(dependencies)
+        разбивает граф на уровни независимых друг от друга моделей.
+
+    copy_model(model, file)
+        быстрая загрузка на PostgreSQL (параметр --fast): файл передается
+        через `COPY FROM STDIN` в промежуточную таблицу, преобразование
+        дат из `date_name_fields` и проверка связей делаются в SQL,
+        затем строки переносятся в таблицу модели. После загрузки
+        строк с явными id сбрасывается последовательность первичного
+        ключа. Файл загружается одной транзакцией, поэтому параметр
+        --chunk-size вместе с --fast не поддерживается.
+        На других базах данных используется загрузка через ORM.
 """
 
 import csv
 import datetime
+import os
 import os.path
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 
 import pytz
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
 from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from reviews.leaderboards import rebuild_all_leaderboards
 
-from api_yamdb.settings import STATICFILES_DIRS
+DATA_DIR = os.path.join(settings.BASE_DIR, 'static', 'data')
 
-MODELS_MODULE_NAME = 'reviews.models'
+MODELS_APP_LABEL = 'reviews'
+
+CHUNK_SIZE = 5000
+
+WORKERS = min(4, os.cpu_count() or 1)
 
 model_file_link = {
     'User': 'users',
@@ -88,10 +149,6 @@ model_file_link = {
     'GenreTitle': 'genre_title'
 }
 
-model_fields_link = {
-    'author': 'User',
-}
-
 date_name_fields = ['pub_date']
 
 ordered_load_models = (
@@ -99,78 +156,356 @@ ordered_load_models = (
     'Title', 'GenreTitle', 'Review', 'Comment'
 )
 
+rating_models = ('Title', 'Review')
+
 
 def get_model(model_name):
     """
     Получаем модель по имени из командной строки,
     либо из настроечной константы tuple: ordered_load_models
     """
-    link_name = model_fields_link.get(model_name.lower())
-    if link_name:
-        model_name = link_name
-
     try:
-        mod = __import__(MODELS_MODULE_NAME, fromlist=[model_name])
-    except ImportError:
-        print(f"Can't import model '{model_name}' from `{MODELS_MODULE_NAME}.")
+        return apps.get_model(MODELS_APP_LABEL, model_name)
+    except LookupError:
         return None
 
-    try:
-        model = getattr(mod, model_name)
-    except AttributeError:
-        return None
-
-    return model
 
-
-def get_model_csv_filename(name):
+def get_model_csv_name(name):
     """
-    Получаем файл csv с данными по имени модели.
+    Получаем имя csv файла модели.
 
     Для имен файлов не совпадающих с именами модели, используем ручную
     настройку через
     dict: model_file_link
     """
-    link_name = model_file_link.get(name)
-    if link_name:
-        name = link_name
+    return f'{model_file_link.get(name, name).lower()}.csv'
+
 
-    csv_file = f'{name.lower()}.csv'
-    file_path = f'{STATICFILES_DIRS[0]}data/{csv_file}'
+def get_model_csv_filename(name, data_dir=DATA_DIR):
+    """Получаем файл csv с данными по имени модели."""
+    file_path = os.path.join(data_dir, get_model_csv_name(name))
     return file_path if os.path.isfile(file_path) else None
 
 
-def create_kwargs(headers, row):
+def get_columns(model, headers):
+    """
+    Сопоставляем заголовок csv файла полям модели.
+    Возвращаем список кортежей (поле модели, связанная модель или None).
+    """
+    columns = []
+    for title in headers:
+        name = title[:-3] if title.endswith('_id') else title
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise CommandError(
+                f'Model `{model.__name__}` has no field for column `{title}`'
+            )
+        columns.append((field, field.related_model if field.many_to_one
+                        else None))
+    return columns
+
+
+def check_required_columns(model, columns):
+    """
+    Проверяем, что в csv файле есть колонки всех обязательных полей:
+    без колонки поле без значения по умолчанию получило бы NULL.
+    """
+    loaded = {field for field, _ in columns}
+    missing = [
+        field.name for field in model._meta.concrete_fields
+        if field not in loaded
+        and not field.primary_key
+        and not field.null
+        and field.get_default() is None
+    ]
+    if missing:
+        raise CommandError(
+            f'File for model `{model.__name__}` has no columns for '
+            f'required fields: {", ".join(missing)}'
+        )
+
+
+def load_pk_map(model):
+    """Получаем словарь id -> pk для связанной модели одним запросом."""
+    return {
+        str(pk): pk
+        for pk in model.objects.values_list('pk', flat=True).iterator()
+    }
+
+
+def create_kwargs(columns, row, pk_maps):
     """
     Создаем словарь из строки файла с параметрами загрузки.
     Ключи это поля модели. Значения это значения для установки в модель.
 
     """
-    kwargs = {'id': headers[0]}
-
-    for count, value in enumerate(row):
-        title = headers[count]
-        if title.endswith('_id'):
-            title = title[:-3]
+    kwargs = {}
 
-        model = get_model(title.capitalize())
-        kwargs[title] = value
+    for (field, related_model), value in zip(columns, row):
+        if related_model is not None:
+            if value == '' and field.null:
+                kwargs[field.attname] = None
+                continue
+            try:
+                kwargs[field.attname] = pk_maps[related_model][value]
+            except KeyError:
+                raise CommandError(
+                    f'Related model `{field.name}` does not exist '
+                    f'element id={value}'
+                )
+            continue
 
-        if title in date_name_fields:
+        if field.name in date_name_fields:
             frmt = "%Y-%m-%dT%H:%M:%S.%fZ"
             date = datetime.datetime.strptime(value, frmt)
-            kwargs[title] = pytz.utc.localize(date)
+            kwargs[field.attname] = pytz.utc.localize(date)
+            continue
+
+        kwargs[field.attname] = field.to_python(value)
 
-        if model:
+    return kwargs
+
+
+def read_chunks(reader, size):
+    """Читаем строки csv файла частями по size строк."""
+    while True:
+        chunk = list(islice(reader, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def save_chunk(model, objs, fields):
+    """
+    Записываем часть строк в одной транзакции.
+    Строки с уже существующим pk обновляются, остальные создаются.
+    """
+    with transaction.atomic():
+        existing = set(
+            model.objects.filter(
+                pk__in=[obj.pk for obj in objs]
+            ).values_list('pk', flat=True)
+        )
+        to_update = [obj for obj in objs if obj.pk in existing]
+        to_create = [obj for obj in objs if obj.pk not in existing]
+        if to_update and fields:
+            model.objects.bulk_update(to_update, fields)
+        if to_create:
+            model.objects.bulk_create(to_create)
+
+
+def load_model(model, file, chunk_size):
+    """Загружаем модель из csv файла, возвращаем количество строк."""
+    with open(file, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        columns = get_columns(model, next(reader))
+        check_required_columns(model, columns)
+        pk_maps = {
+            related_model: load_pk_map(related_model)
+            for _, related_model in columns
+            if related_model is not None
+        }
+        fields = [
+            field.name for field, _ in columns if not field.primary_key
+        ]
+
+        count = 0
+        for chunk in read_chunks(reader, chunk_size):
             try:
-                kwargs[title] = model.objects.get(pk=int(value))
-            except model.DoesNotExist:
+                objs = [
+                    model(**create_kwargs(columns, row, pk_maps))
+                    for row in chunk
+                ]
+            except CommandError as error:
                 raise CommandError(
-                    f'Related model `{title}` does not exist '
-                    f'element id={value}'
+                    f'{error} (model `{model.__name__}`, '
+                    f'rows {count + 1}-{count + len(chunk)})'
+                )
+            try:
+                save_chunk(model, objs, fields)
+            except Exception as error:
+                raise CommandError(
+                    f'Can`t create model "{model.__name__}": {error}'
                 )
+            count += len(chunk)
 
-    return kwargs
+    if any(field.primary_key for field, _ in columns):
+        reset_sequences(model)
+    return count
+
+
+def reset_sequences(model):
+    """
+    Сбрасываем последовательность первичного ключа PostgreSQL
+    после загрузки строк с явно указанными id.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+            cursor.execute(sql)
+
+
+def get_copy_select(model, columns):
+    """
+    Строим список колонок и выражений SELECT для переноса строк из
+    промежуточной таблицы в таблицу модели: приведение типов, разбор
+    дат из `date_name_fields` и значения по умолчанию для полей,
+    которых нет в csv файле (см. check_required_columns).
+    """
+    qn = connection.ops.quote_name
+    targets, selects, params = [], [], []
+
+    for field, _ in columns:
+        # Пустое значение в csv COPY загружает как NULL.
+        value = f's.{qn(field.column)}'
+        if field.null:
+            value = f"NULLIF({value}, '')"
+        elif field.empty_strings_allowed:
+            value = f"COALESCE({value}, '')"
+        if field.name in date_name_fields:
+            value = f'CAST({value} AS timestamp with time zone)'
+        else:
+            value = f'CAST({value} AS {field.cast_db_type(connection)})'
+        targets.append(qn(field.column))
+        selects.append(value)
+
+    loaded = {field for field, _ in columns}
+    for field in model._meta.concrete_fields:
+        if field in loaded or field.primary_key:
+            continue
+        targets.append(qn(field.column))
+        selects.append('%s')
+        params.append(field.get_db_prep_save(field.get_default(), connection))
+
+    return targets, selects, params
+
+
+def check_copy_relations(cursor, staging, columns):
+    """Проверяем в SQL, что все связанные объекты существуют."""
+    qn = connection.ops.quote_name
+    for field, related_model in columns:
+        if related_model is None:
+            continue
+        related = related_model._meta
+        cursor.execute(
+            f'SELECT s.{qn(field.column)} FROM {qn(staging)} s '
+            f"WHERE NULLIF(s.{qn(field.column)}, '') IS NOT NULL "
+            f'AND NOT EXISTS (SELECT 1 FROM {qn(related.db_table)} r '
+            f'WHERE r.{qn(related.pk.column)} = '
+            f'CAST(s.{qn(field.column)} AS '
+            f'{related.pk.cast_db_type(connection)})) LIMIT 1'
+        )
+        missing = cursor.fetchone()
+        if missing:
+            raise CommandError(
+                f'Related model `{field.name}` does not exist '
+                f'element id={missing[0]}'
+            )
+
+
+def copy_model(model, file, chunk_size=None):
+    """
+    Быстрая загрузка модели на PostgreSQL.
+
+    Файл целиком передается через `COPY FROM STDIN` в промежуточную
+    временную таблицу, связи проверяются и строки переносятся в таблицу
+    модели SQL запросами (`INSERT ... ON CONFLICT DO UPDATE`).
+    Загрузка идет одной транзакцией, `chunk_size` не используется.
+    """
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    staging = f'initdata_{table}'
+
+    with open(file, 'r', encoding='utf-8') as f:
+        columns = get_columns(model, next(csv.reader(f)))
+    check_required_columns(model, columns)
+    targets, selects, params = get_copy_select(model, columns)
+    pk_column = qn(model._meta.pk.column)
+    updates = ', '.join(
+        f'{qn(field.column)} = EXCLUDED.{qn(field.column)}'
+        for field, _ in columns if not field.primary_key
+    )
+    on_conflict = (
+        f'ON CONFLICT ({pk_column}) DO UPDATE SET {updates}' if updates
+        else f'ON CONFLICT ({pk_column}) DO NOTHING'
+    )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        staging_columns = ', '.join(
+            f'{qn(field.column)} text' for field, _ in columns
+        )
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {qn(staging)} ({staging_columns}) '
+            f'ON COMMIT DROP'
+        )
+        with open(file, 'r', encoding='utf-8') as f:
+            cursor.copy_expert(
+                f'COPY {qn(staging)} FROM STDIN WITH (FORMAT csv, HEADER)',
+                f,
+            )
+        check_copy_relations(cursor, staging, columns)
+        cursor.execute(
+            f'INSERT INTO {qn(table)} ({", ".join(targets)}) '
+            f'SELECT {", ".join(selects)} FROM {qn(staging)} s '
+            f'{on_conflict}',
+            params,
+        )
+        count = cursor.rowcount
+
+    if any(field.primary_key for field, _ in columns):
+        reset_sequences(model)
+    return count
+
+
+def get_dependencies(models):
+    """
+    Строим граф зависимостей моделей по их внешним ключам.
+    Возвращаем словарь: модель -> множество моделей из того же набора,
+    которые должны быть загружены раньше нее.
+    """
+    return {
+        model: {
+            field.related_model for field in model._meta.concrete_fields
+            if field.many_to_one
+            and field.related_model in models
+            and field.related_model is not model
+        }
+        for model in models
+    }
+
+
+def get_load_order(dependencies):
+    """
+    Топологическая сортировка графа зависимостей.
+    Возвращаем список уровней: модели одного уровня не зависят
+    друг от друга и могут загружаться одновременно.
+    """
+    pending = {model: set(deps) for model, deps in dependencies.items()}
+    levels = []
+    while pending:
+        level = [model for model, deps in pending.items() if not deps]
+        if not level:
+            names = ', '.join(model.__name__ for model in pending)
+            raise CommandError(f'Cyclic dependency between models: {names}')
+        for model in level:
+            del pending[model]
+        for deps in pending.values():
+            deps.difference_update(level)
+        levels.append(level)
+    return levels
+
+
+def load_in_worker(loader, model, file, chunk_size):
+    """
+    Загружаем модель в потоке пула.
+    У каждого потока свое соединение с базой, закрываем его в конце.
+    """
+    try:
+        return loader(model, file, chunk_size)
+    finally:
+        connection.close()
 
 
 class Command(BaseCommand):
@@ -179,16 +514,29 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('--models', nargs='+', type=str, default='--all')
-
-    def handle(self, *args, **options):
-
-        source = options['models']
-        if options['models'] == '--all':
-            source = ordered_load_models
-
-        for name in source:
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help=f'Rows saved per transaction, {CHUNK_SIZE} by default '
+                 '(not supported with --fast)',
+        )
+        parser.add_argument(
+            '--data-dir', default=DATA_DIR,
+            help='Directory with csv files, e.g. made by generate_data',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=WORKERS,
+            help='Number of models loaded at the same time',
+        )
+        parser.add_argument(
+            '--fast', action='store_true',
+            help='Load files with COPY FROM STDIN (PostgreSQL only)',
+        )
+
+    def get_sources(self, names, data_dir=DATA_DIR):
+        sources = {}
+        for name in names:
             model = get_model(name)
-            file = get_model_csv_filename(name)
+            file = get_model_csv_filename(name, data_dir)
             if not all([model, file]):
                 self.stdout.write(
                     self.style.ERROR(
@@ -196,22 +544,104 @@ class Command(BaseCommand):
                     )
                 )
                 continue
+            sources[model] = file
+        return sources
+
+    def report(self, model, count, elapsed):
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully load model `{model.__name__}`, '
+                f'create {count} row in database '
+                f'in {elapsed:.2f}s ({count / max(elapsed, 1e-6):.0f} '
+                f'rows/s).')
+        )
+
+    def load_sequential(self, loader, levels, sources, chunk_size):
+        for level in levels:
+            for model in level:
+                started = time.monotonic()
+                count = loader(model, sources[model], chunk_size)
+                self.report(model, count, time.monotonic() - started)
+
+    def load_parallel(self, loader, dependencies, sources, chunk_size,
+                      workers):
+        """
+        Запускаем загрузку модели, как только загружены все модели,
+        от которых она зависит.
+        """
+        pending = {model: set(deps) for model, deps in dependencies.items()}
+        running = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                for model in [m for m, deps in pending.items() if not deps]:
+                    del pending[model]
+                    future = executor.submit(
+                        load_in_worker, loader, model, sources[model],
+                        chunk_size,
+                    )
+                    running[future] = (model, time.monotonic())
 
-            with open(file, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                headers = next(reader)
-                for count, row in enumerate(reader):
-                    kwargs = create_kwargs(headers, row)
-
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    model, started = running.pop(future)
                     try:
-                        model.objects.update_or_create(
-                            id=kwargs['id'], defaults=kwargs
-                        )
+                        count = future.result()
                     except Exception:
-                        raise CommandError('Can`t create model "%s"' % name)
+                        for other in running:
+                            other.cancel()
+                        raise
+                    self.report(model, count, time.monotonic() - started)
+                    for deps in pending.values():
+                        deps.discard(model)
+
+    def handle(self, *args, **options):
 
+        source = options['models']
+        if options['models'] == '--all':
+            source = ordered_load_models
+
+        sources = self.get_sources(source, options['data_dir'])
+        dependencies = get_dependencies(sources)
+        levels = get_load_order(dependencies)
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite':
+            workers = 1
+
+        loader = load_model
+        chunk_size = options['chunk_size'] or CHUNK_SIZE
+        if options['fast']:
+            if connection.vendor == 'postgresql':
+                if options['chunk_size'] is not None:
+                    raise CommandError(
+                        '--chunk-size is not supported with --fast: '
+                        'COPY loads each file in one transaction.'
+                    )
+                loader = copy_model
+            else:
+                self.stdout.write(
+                    self.style.WARNING(
+                        '--fast is supported only on PostgreSQL, '
+                        'loading with ORM.'
+                    )
+                )
+
+        if workers > 1:
+            self.load_parallel(
+                loader, dependencies, sources, chunk_size, workers
+            )
+        else:
+            self.load_sequential(loader, levels, sources, chunk_size)
+
+        if any(model.__name__ in rating_models for model in sources):
+            Title = get_model('Title')
+            Title.objects.recalculate_ratings()
+            self.stdout.write(
+                self.style.SUCCESS('Successfully recalculate title ratings.')
+            )
+            rows = rebuild_all_leaderboards()
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'Successfully load model `{name}`, '
-                    f'create {count + 1} row in database.')
+                    f'Successfully rebuilt {rows} leaderboard rows.'
+                )
             )
@@ -0,0 +1,58 @@
+"""
+Модуль recalculate_ratings пересчитывает хранимый рейтинг произведений.
+
+    Сравнивает сохраненные в `Title` сумму оценок и количество отзывов
+    с посчитанными по таблице отзывов, выводит расхождения и
+    пересчитывает рейтинг всех произведений заново.
+
+    python manage.py recalculate_ratings
+
+    С параметром --dry-run только выводит расхождения,
+    ничего не изменяя в базе.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from reviews.models import Title
+
+DRIFT_REPORT_LIMIT = 20
+
+
+class Command(BaseCommand):
+    """Класс для пересчета рейтинга произведений"""
+    help = 'Rebuilds stored title ratings from reviews and reports drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drift, do not change ratings',
+        )
+
+    def handle(self, *args, **options):
+        drifted = Title.objects.with_actual_ratings().filter(
+            ~Q(rating_sum=F('actual_sum')) | ~Q(review_count=F('actual_count'))
+        ).order_by('pk')
+
+        total = 0
+        for title in drifted.iterator():
+            total += 1
+            if total <= DRIFT_REPORT_LIMIT:
+                self.stdout.write(
+                    f'Title id={title.pk}: '
+                    f'stored sum={title.rating_sum} '
+                    f'count={title.review_count}, '
+                    f'actual sum={title.actual_sum} '
+                    f'count={title.actual_count}'
+                )
+
+        self.stdout.write(f'Found {total} titles with rating drift.')
+        if options['dry_run']:
+            return
+
+        with transaction.atomic():
+            updated = Title.objects.recalculate_ratings()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully recalculated {updated} titles.')
+        )
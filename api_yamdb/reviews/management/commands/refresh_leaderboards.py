@@ -0,0 +1,26 @@
+"""
+Модуль refresh_leaderboards перестраивает таблицы лидеров.
+
+    Сигналы обновляют таблицы лидеров при изменении отзывов
+    и произведений. Изменения в обход сигналов (загрузка данных,
+    `QuerySet.update`, пересчет рейтинга) таблицы не обновляют,
+    поэтому команду стоит запускать после них и по расписанию.
+
+    python manage.py refresh_leaderboards
+"""
+from django.core.management.base import BaseCommand
+
+from reviews.leaderboards import rebuild_all_leaderboards
+
+
+class Command(BaseCommand):
+    """Класс для перестройки таблиц лидеров"""
+    help = 'Rebuilds top titles leaderboards of every category and genre'
+
+    def handle(self, *args, **options):
+        total = rebuild_all_leaderboards()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully rebuilt {total} leaderboard rows.'
+            )
+        )
@@ -0,0 +1,144 @@
+"""
+Модуль send_outbox отправляет письма из очереди `EmailOutbox`.
+
+    Письма выбираются пачками по --batch-size штук и отправляются через
+    одно соединение с почтовым сервером на пачку. Пачка забирается
+    короткой транзакцией (`SELECT ... FOR UPDATE SKIP LOCKED`):
+    попытка засчитывается, а `send_after` сдвигается на --lease секунд,
+    поэтому другие обработчики эту пачку не берут. Письма отправляются
+    вне транзакции, результаты записываются второй короткой
+    транзакцией, так что медленный почтовый сервер не держит
+    транзакцию и блокировки строк. Если обработчик упал во время
+    отправки, пачка снова станет доступна после окончания аренды.
+
+    Неудачная отправка откладывается с экспоненциальной задержкой:
+    --backoff секунд после первой ошибки, дальше вдвое больше после
+    каждой следующей. После EMAIL_OUTBOX_MAX_ATTEMPTS попыток
+    (настройка, ее же использует метрика неотправленных писем
+    в /metrics) письмо больше не отправляется, текст ошибки остается
+    в `last_error`.
+
+    python manage.py send_outbox
+        отправляет все письма, готовые к отправке, и завершается.
+
+    python manage.py send_outbox --loop --interval 5
+        работает постоянно, проверяя очередь каждые 5 секунд.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from reviews.models import EmailOutbox
+
+BATCH_SIZE = 100
+BACKOFF = 60
+LEASE = 300
+
+
+class Command(BaseCommand):
+    """Класс для отправки писем из очереди"""
+    help = 'Sends queued emails from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--max-attempts', type=int,
+            default=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+            help='Overrides EMAIL_OUTBOX_MAX_ATTEMPTS, /metrics keeps '
+                 'using the setting',
+        )
+        parser.add_argument(
+            '--backoff', type=int, default=BACKOFF,
+            help='Delay in seconds before the first retry',
+        )
+        parser.add_argument(
+            '--lease', type=int, default=LEASE,
+            help='Seconds a claimed batch is hidden from other workers',
+        )
+        parser.add_argument('--loop', action='store_true')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds between queue checks in --loop mode',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent = failed = 0
+            while True:
+                batch_sent, batch_failed = self.send_batch(options)
+                sent += batch_sent
+                failed += batch_failed
+                if batch_sent + batch_failed < options['batch_size']:
+                    break
+
+            if sent or failed or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'Sent {sent} emails, {failed} failed.'
+                    )
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def claim_batch(self, options):
+        """
+        Забираем пачку писем: засчитываем попытку и откладываем
+        письма на время аренды, чтобы их не взяли другие обработчики.
+        """
+        lease_until = timezone.now() + timedelta(seconds=options['lease'])
+        with transaction.atomic():
+            batch = list(
+                EmailOutbox.objects.pending(options['max_attempts'])
+                .select_for_update(skip_locked=True)
+                .order_by('send_after')[:options['batch_size']]
+            )
+            for message in batch:
+                message.attempts += 1
+                message.send_after = lease_until
+            EmailOutbox.objects.bulk_update(batch, ['attempts', 'send_after'])
+        return batch
+
+    def send_batch(self, options):
+        """Отправляем одну пачку писем через одно соединение."""
+        batch = self.claim_batch(options)
+        if not batch:
+            return 0, 0
+
+        sent = failed = 0
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as error:
+            for message in batch:
+                self.mark_failed(message, error, options['backoff'])
+            failed = len(batch)
+        else:
+            for message in batch:
+                try:
+                    connection.send_messages([message.as_email()])
+                except Exception as error:
+                    self.mark_failed(message, error, options['backoff'])
+                    failed += 1
+                else:
+                    message.sent_at = timezone.now()
+                    sent += 1
+            connection.close()
+
+        EmailOutbox.objects.bulk_update(
+            batch, ['sent_at', 'send_after', 'last_error']
+        )
+        return sent, failed
+
+    @staticmethod
+    def mark_failed(message, error, backoff):
+        # Попытка уже засчитана в claim_batch
+        message.last_error = str(error)
+        message.send_after = timezone.now() + timedelta(
+            seconds=backoff * 2 ** (message.attempts - 1)
+        )
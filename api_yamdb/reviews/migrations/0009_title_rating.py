@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:49
+
+from django.db import migrations, models
+from django.db.models import (Count, ExpressionWrapper, FloatField, OuterRef,
+                              Subquery, Sum, Value)
+from django.db.models.functions import Cast, Coalesce
+
+
+def fill_ratings(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    reviews = Review.objects.filter(
+        title=OuterRef('pk')
+    ).order_by().values('title')
+    Title.objects.update(
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(total=Sum('score')).values('total')),
+            Value(0),
+        ),
+        review_count=Coalesce(
+            Subquery(reviews.annotate(total=Count('pk')).values('total')),
+            Value(0),
+        ),
+        rating=Subquery(
+            reviews.annotate(
+                total=ExpressionWrapper(
+                    Cast(Sum('score'), FloatField()) / Count('pk'),
+                    output_field=FloatField(),
+                )
+            ).values('total')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_auto_20220606_2008'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='rating',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True, verbose_name='Рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+TRIGRAM_INDEXES = (
+    ('reviews_title', 'title_name_trgm'),
+    ('reviews_genre', 'genre_name_trgm'),
+    ('reviews_category', 'category_name_trgm'),
+)
+
+
+def trigram_available(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        return cursor.fetchone() is not None
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    Индексы только ускоряют поиск, поэтому без расширения pg_trgm
+    миграция их пропускает: поиск работает и без них.
+    """
+    if not trigram_available(schema_editor):
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, index in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{index}" '
+            f'ON "{table}" USING gin ("name" gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, index in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0010_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_email_outbox'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='confirmation_code',
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:14
+
+from django.db import migrations, models
+
+# Индекс по убыванию рейтинга с NULL в конце, как сортирует
+# `?ordering=-rating`. Django 2.2 не умеет NULLS LAST в Meta.indexes.
+RATING_INDEXES = (
+    ('title_rating_id', ''),
+    ('title_category_rating_id', '"category_id", '),
+)
+
+
+def create_rating_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        rating = '"rating" DESC NULLS LAST'
+    else:
+        rating = '"rating" DESC'
+    for index, prefix in RATING_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{index}" '
+            f'ON "reviews_title" ({prefix}{rating}, "id")'
+        )
+
+
+def drop_rating_indexes(apps, schema_editor):
+    for index, _ in RATING_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_remove_user_confirmation_code'),
+    ]
+
+    operations = [
+        # Индекс title_rating_id покрывает фильтры по рейтингу
+        migrations.AlterField(
+            model_name='title',
+            name='rating',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Рейтинг'),
+        ),
+        migrations.RunPython(create_rating_indexes, drop_rating_indexes),
+    ]
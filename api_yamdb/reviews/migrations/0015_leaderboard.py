@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0014_title_rating_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Категория'), ('genre', 'Жанр')], max_length=8, verbose_name='Тип таблицы')),
+                ('slug', models.SlugField(db_index=False, verbose_name='Slug категории или жанра')),
+                ('position', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('name', models.CharField(max_length=256, verbose_name='Название произведения')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Год выпуска')),
+                ('rating', models.FloatField(verbose_name='Рейтинг')),
+                ('review_count', models.PositiveIntegerField(verbose_name='Количество отзывов')),
+                ('title', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='leaderboard_entries', to='reviews.Title')),
+            ],
+            options={
+                'verbose_name': 'Место в таблице лидеров',
+                'verbose_name_plural': 'Таблицы лидеров',
+                'ordering': ('kind', 'slug', 'position'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'slug', 'position'), name='leaderboard_position'),
+        ),
+    ]
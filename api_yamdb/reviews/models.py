@@ -1,15 +1,47 @@
+from contextlib import contextmanager
+from threading import local
+
 from django.contrib.auth.models import AbstractUser
+from django.core.mail import EmailMessage
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import (Count, ExpressionWrapper, F, FloatField,
+                              OuterRef, Q, Subquery, Sum, Value)
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.utils import timezone
 
 SLICE_REVIEW = 30
 
+RATING_FIELDS = ('rating_sum', 'review_count', 'rating')
+
+# id удаляемых произведений, отдельно для каждого потока
+_deleting = local()
+
+
+def deleting_title_ids():
+    """
+    id произведений, которые сейчас удаляются. Их отзывы удаляются
+    каскадом, и обработчики reviews.signals не пересчитывают для них
+    рейтинг и таблицы лидеров. id добавляет обработчик pre_delete.
+    """
+    return _deleting.__dict__.setdefault('title_ids', set())
+
+
+@contextmanager
+def title_deletion():
+    """Снимает отметки удаления произведений, в том числе после ошибки."""
+    title_ids = deleting_title_ids()
+    before = set(title_ids)
+    try:
+        yield
+    finally:
+        title_ids.intersection_update(before)
+
 
 class User(AbstractUser):
     """
     Кастомная модель пользователя.
-    Доп.поля: Био, Роль, Код подтверждения.
+    Доп.поля: Био, Роль.
     Методы: is_moderator, is_admin
     """
     USER = 'user'
@@ -32,11 +64,6 @@ class User(AbstractUser):
         default=USER,
         db_index=True
     )
-    confirmation_code = models.TextField(
-        'Код подтверждения',
-        null=True,
-        blank=True,
-    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -93,8 +120,66 @@ class Genre(models.Model):
         return self.slug
 
 
+class TitleQuerySet(models.QuerySet):
+    """Queryset произведений с операциями над хранимым рейтингом."""
+
+    def delete(self):
+        with title_deletion():
+            return super().delete()
+
+    def add_scores(self, score_delta, count_delta):
+        """
+        Атомарно изменяет сумму оценок и количество отзывов одним UPDATE.
+        Рейтинг пересчитывается в том же запросе из новых значений.
+        """
+        rating_sum = F('rating_sum') + score_delta
+        review_count = F('review_count') + count_delta
+        return self.update(
+            rating_sum=rating_sum,
+            review_count=review_count,
+            rating=ExpressionWrapper(
+                Cast(rating_sum, FloatField()) / NullIf(review_count, 0),
+                output_field=FloatField(),
+            ),
+        )
+
+    def recalculate_ratings(self):
+        """Пересчитывает рейтинг произведений по всем их отзывам."""
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')
+        ).order_by().values('title')
+        return self.update(
+            rating_sum=Coalesce(
+                Subquery(reviews.annotate(total=Sum('score')).values('total')),
+                Value(0),
+            ),
+            review_count=Coalesce(
+                Subquery(reviews.annotate(total=Count('pk')).values('total')),
+                Value(0),
+            ),
+            rating=Subquery(
+                reviews.annotate(
+                    total=ExpressionWrapper(
+                        Cast(Sum('score'), FloatField()) / Count('pk'),
+                        output_field=FloatField(),
+                    )
+                ).values('total')
+            ),
+        )
+
+    def with_actual_ratings(self):
+        """Добавляет сумму оценок и число отзывов, посчитанные по отзывам."""
+        return self.annotate(
+            actual_sum=Coalesce(Sum('reviews__score'), Value(0)),
+            actual_count=Count('reviews'),
+        )
+
+
 class Title(models.Model):
-    """Модель для работы с произведениями"""
+    """
+    Модель для работы с произведениями.
+    Поля rating_sum, review_count и rating обновляются отзывами.
+    """
     name = models.CharField(
         max_length=256,
         verbose_name='Название произведения',
@@ -110,9 +195,53 @@ class Title(models.Model):
         verbose_name='Категория',
         help_text='Укажите категорию произведения'
     )
+    rating_sum = models.PositiveIntegerField(
+        'Сумма оценок',
+        default=0,
+        editable=False,
+    )
+    review_count = models.PositiveIntegerField(
+        'Количество отзывов',
+        default=0,
+        editable=False,
+    )
+    rating = models.FloatField(
+        'Рейтинг',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         ordering = ('name',)
+        indexes = [
+            models.Index(fields=['name', 'id'], name='title_name_id'),
+            # `?ordering=rating`: по возрастанию NULL и так в конце.
+            # Индексы по убыванию - в миграции 0014
+            models.Index(fields=['rating', 'id'], name='title_rating_asc_id'),
+            models.Index(
+                fields=['category', 'rating', 'id'],
+                name='title_category_rating_asc',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняем произведение, не перезаписывая рейтинг,
+        который параллельно обновляется отзывами.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with title_deletion():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return self.name[:SLICE_REVIEW]
@@ -137,6 +266,11 @@ class GenreTitle(models.Model):
 
     class Meta:
         ordering = ('genre',)
+        indexes = [
+            # Произведения жанра для таблицы лидеров без чтения таблицы
+            models.Index(fields=['genre', 'title'],
+                         name='genretitle_genre_title'),
+        ]
 
     def __str__(self):
         return f'{self.title} {self.genre}'
@@ -182,6 +316,10 @@ class Review(models.Model):
 
         indexes = [
             models.Index(fields=['author', 'title'], name='author_title'),
+            models.Index(
+                fields=['title', '-pub_date', 'id'],
+                name='review_title_pub_date_id',
+            ),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -190,6 +328,48 @@ class Review(models.Model):
             )
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_rating()
+        return instance
+
+    def remember_rating(self):
+        """Запоминаем сохраненные в базе произведение и оценку отзыва."""
+        self._saved_rating = (
+            self.__dict__.get('title_id'), self.__dict__.get('score')
+        )
+
+    def lock_rating(self, using):
+        """
+        Блокирует строку отзыва и запоминает ее произведение и оценку.
+        Изменение рейтинга считается от строки в базе, а не от значений,
+        загруженных в объект раньше: параллельные изменения одного
+        отзыва применяются по очереди. Если строки нет, запоминается None.
+        """
+        self._saved_rating = type(self)._base_manager.using(
+            using
+        ).select_for_update().filter(pk=self.pk).values_list(
+            'title_id', 'score'
+        ).first()
+
+    def save(self, *args, **kwargs):
+        """Сохраняем отзыв и рейтинг произведения в одной транзакции."""
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            if not self._state.adding and self.pk is not None:
+                self.lock_rating(using)
+            super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        """Удаляем отзыв и обновляем рейтинг в одной транзакции."""
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            self.lock_rating(using)
+            return super().delete(using=using, keep_parents=keep_parents)
+
     def __str__(self):
         return self.text[:SLICE_REVIEW]
 
@@ -217,6 +397,119 @@ class Comment(models.Model):
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Комментарий'
+        indexes = [
+            models.Index(
+                fields=['review', '-pub_date', 'id'],
+                name='comment_review_pub_date_id',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:SLICE_REVIEW]
+
+
+class EmailOutboxQuerySet(models.QuerySet):
+    """Queryset очереди писем."""
+
+    def pending(self, max_attempts):
+        """Неотправленные письма, время отправки которых наступило."""
+        return self.filter(
+            sent_at__isnull=True,
+            send_after__lte=timezone.now(),
+            attempts__lt=max_attempts,
+        )
+
+
+class EmailOutbox(models.Model):
+    """
+    Очередь исходящих писем.
+    Письмо записывается в транзакции запроса, а отправляется
+    отдельным процессом: management командой send_outbox.
+    """
+    subject = models.CharField('Тема', max_length=255)
+    body = models.TextField('Текст письма')
+    from_email = models.CharField('Отправитель', max_length=254)
+    to = models.EmailField('Получатель', max_length=254)
+    created = models.DateTimeField('Дата создания', default=timezone.now)
+    send_after = models.DateTimeField(
+        'Отправить после',
+        default=timezone.now,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Количество попыток',
+        default=0,
+    )
+    sent_at = models.DateTimeField('Дата отправки', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    objects = EmailOutboxQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('send_after',)
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        indexes = [
+            models.Index(
+                fields=['send_after'],
+                name='outbox_pending',
+                condition=Q(sent_at__isnull=True),
+            ),
+        ]
+
+    def as_email(self, connection=None):
+        return EmailMessage(
+            self.subject,
+            self.body,
+            self.from_email,
+            [self.to],
+            connection=connection,
+        )
+
+    def __str__(self):
+        return f'{self.to}: {self.subject}'
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Строка таблицы лидеров: место произведения в топе по рейтингу
+    категории или жанра.
+    Название, год и рейтинг скопированы из произведения, чтобы топ
+    читался одним проходом по индексу (kind, slug, position)
+    без соединений. Таблицы обновляет модуль reviews.leaderboards.
+    """
+    CATEGORY = 'category'
+    GENRE = 'genre'
+    KINDS = (
+        (CATEGORY, 'Категория'),
+        (GENRE, 'Жанр'),
+    )
+
+    kind = models.CharField('Тип таблицы', max_length=8, choices=KINDS)
+    slug = models.SlugField('Slug категории или жанра', db_index=False)
+    position = models.PositiveSmallIntegerField('Место')
+    # Без внешнего ключа в базе: строки удаленного произведения
+    # убирает перестройка таблицы после удаления
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='leaderboard_entries',
+    )
+    name = models.CharField('Название произведения', max_length=256)
+    year = models.PositiveSmallIntegerField('Год выпуска')
+    rating = models.FloatField('Рейтинг')
+    review_count = models.PositiveIntegerField('Количество отзывов')
+
+    class Meta:
+        ordering = ('kind', 'slug', 'position')
+        verbose_name = 'Место в таблице лидеров'
+        verbose_name_plural = 'Таблицы лидеров'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'slug', 'position'],
+                name='leaderboard_position',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.slug} #{self.position}: {self.name}'
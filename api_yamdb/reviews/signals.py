@@ -0,0 +1,118 @@
+"""
+Обработчики сигналов для поддержки хранимого рейтинга произведений
+и таблиц лидеров.
+
+Сумма оценок и количество отзывов обновляются инкрементально при
+создании, изменении и удалении отзыва, независимо от того, откуда
+пришло изменение: API, админка или management команды.
+После коммита обновляются таблицы лидеров, которые затрагивает
+изменение (см. reviews.leaderboards). Отзывы, удаляемые каскадом
+вместе с произведением, рейтинг и таблицы не обновляют.
+"""
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .leaderboards import (prune_leaderboards, schedule_rebuild,
+                           schedule_refresh, title_leaderboards)
+from .models import (Category, Genre, GenreTitle, LeaderboardEntry, Review,
+                     Title, deleting_title_ids)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    saved = getattr(instance, '_saved_rating', None)
+    title_id, score = int(instance.title_id), int(instance.score)
+    titles = Title.objects.all()
+
+    if created:
+        titles.filter(pk=title_id).add_scores(score, 1)
+    elif saved is None or None in saved:
+        titles.filter(pk=title_id).recalculate_ratings()
+    elif saved[0] == title_id:
+        if saved[1] != score:
+            titles.filter(pk=title_id).add_scores(score - saved[1], 0)
+    else:
+        titles.filter(pk=saved[0]).add_scores(-saved[1], -1)
+        titles.filter(pk=title_id).add_scores(score, 1)
+        schedule_refresh(saved[0])
+
+    instance._saved_rating = (title_id, score)
+    schedule_refresh(title_id)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    if instance.title_id in deleting_title_ids():
+        # Произведение удаляется вместе с отзывом
+        return
+    saved = getattr(instance, '_saved_rating', None)
+    if saved is None:
+        # Отзыв уже удален, DELETE не удалил ни одной строки
+        return
+    if None in saved:
+        Title.objects.filter(pk=instance.title_id).recalculate_ratings()
+    else:
+        Title.objects.filter(pk=saved[0]).add_scores(-saved[1], -1)
+    schedule_refresh(int(instance.title_id))
+
+
+@receiver(post_save, sender=Title)
+def update_title_leaderboards(sender, instance, created, **kwargs):
+    # У нового произведения еще нет отзывов и рейтинга
+    if not created:
+        schedule_refresh(instance.pk)
+
+
+@receiver(pre_delete, sender=Title)
+def remember_title_leaderboards(sender, instance, **kwargs):
+    deleting_title_ids().add(instance.pk)
+    instance._leaderboards = title_leaderboards(instance.pk)
+
+
+@receiver(post_delete, sender=Title)
+def update_leaderboards_on_title_delete(sender, instance, **kwargs):
+    deleting_title_ids().discard(instance.pk)
+    for kind, slug in sorted(getattr(instance, '_leaderboards', ())):
+        schedule_rebuild(kind, slug)
+
+
+@receiver(post_save, sender=GenreTitle)
+@receiver(post_delete, sender=GenreTitle)
+def update_genre_title_leaderboards(sender, instance, **kwargs):
+    if (
+        instance.title_id is not None
+        and instance.title_id not in deleting_title_ids()
+    ):
+        schedule_refresh(instance.title_id)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def update_title_genres_leaderboards(sender, instance, action, reverse,
+                                     **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        schedule_rebuild(LeaderboardEntry.GENRE, instance.slug)
+    else:
+        schedule_refresh(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Genre)
+def update_group_leaderboard(sender, instance, created, **kwargs):
+    if created:
+        return
+    kind = {
+        Category: LeaderboardEntry.CATEGORY,
+        Genre: LeaderboardEntry.GENRE,
+    }[sender]
+    # Таблица со старым slug удаляется, с новым строится заново
+    prune_leaderboards()
+    schedule_rebuild(kind, instance.slug)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Genre)
+def delete_group_leaderboard(sender, instance, **kwargs):
+    prune_leaderboards()
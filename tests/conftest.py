@@ -1,9 +1,46 @@
 import sys
 from os.path import abspath, dirname, join
 
+import pytest
+from django.core.cache import cache
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 infra_dir_path = join(root_dir, 'infra')
 
 pytest_plugins = [
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user_client():
+    """Клиент API с JWT токеном пользователя: `user_client(user)`."""
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    def make_client(user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+        )
+        return client
+
+    return make_client
+
+
+@pytest.fixture
+def admin_client(user_client):
+    """Клиент API с JWT токеном нового администратора."""
+    from reviews.models import User
+
+    admin = User.objects.create(
+        username='admin', email='admin@yamdb.fake', role=User.ADMIN
+    )
+    return user_client(admin)
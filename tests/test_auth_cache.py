@@ -0,0 +1,70 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from reviews.models import User
+
+
+def user_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    return response, [
+        query for query in context.captured_queries
+        if '"reviews_user"' in query['sql']
+    ]
+
+
+@pytest.mark.django_db
+class TestCachedAuthentication:
+
+    def test_user_is_cached(self, user_client):
+        user = User.objects.create(username='reader', email='r@yamdb.fake')
+        client = user_client(user)
+
+        _, first = user_queries(client, '/api/v1/titles/')
+        response, second = user_queries(client, '/api/v1/titles/')
+
+        assert response.status_code == 200
+        assert len(first) == 1 and len(second) == 0, (
+            'Проверьте, что пользователь для JWT аутентификации '
+            'берется из кэша'
+        )
+
+    def test_role_change_invalidates_cache(self, user_client):
+        user = User.objects.create(username='reader', email='r@yamdb.fake')
+        client = user_client(user)
+        assert client.get('/api/v1/users/').status_code == 403
+
+        user.role = User.ADMIN
+        user.save()
+
+        assert client.get('/api/v1/users/').status_code == 200, (
+            'Проверьте, что изменение роли сбрасывает кэш пользователя'
+        )
+
+    def test_me_patch_keeps_other_fields(self, user_client):
+        user = User.objects.create(
+            username='reader', email='r@yamdb.fake', bio='Био'
+        )
+        user.set_password('secret')
+        user.save()
+        client = user_client(user)
+        client.get('/api/v1/users/me/')
+
+        response = client.patch('/api/v1/users/me/', {'first_name': 'Имя'})
+
+        assert response.status_code == 200
+        user.refresh_from_db()
+        assert (user.first_name, user.bio) == ('Имя', 'Био')
+        assert user.check_password('secret'), (
+            'Проверьте, что сохранение пользователя из кэша '
+            'не затирает остальные поля'
+        )
+
+    def test_deleted_user_is_rejected(self, user_client):
+        user = User.objects.create(username='reader', email='r@yamdb.fake')
+        client = user_client(user)
+        client.get('/api/v1/users/me/')
+
+        user.delete()
+
+        assert client.get('/api/v1/users/me/').status_code == 401
@@ -0,0 +1,324 @@
+"""
+Бенчмарк эндпоинтов API.
+
+    На синтетических данных вызывает каждый маршрут из api/urls.py
+    и замеряет количество запросов к базе, p50/p95 времени ответа
+    и размер ответа. Результаты сравниваются с benchmark_baseline.json,
+    отдельно для каждой базы данных: количество запросов не должно
+    расти, размер ответа - отличаться больше чем на
+    BENCHMARK_BYTES_TOLERANCE. Время ответа сравнивается
+    только при BENCHMARK_STRICT_LATENCY=1, так как зависит от машины.
+
+    Переменные окружения:
+        BENCHMARK_SCALE - множитель размера данных (по умолчанию 1)
+        BENCHMARK_REPEAT - количество повторов запроса (по умолчанию 5)
+        BENCHMARK_REPORT - путь для JSON отчета
+        BENCHMARK_UPDATE_BASELINE=1 - перезаписать baseline
+
+    Каждый запрос выполняется в откатываемой транзакции с пустым кэшем,
+    поэтому запросы на запись не меняют данные следующих замеров.
+
+    Замеры не входят в обычный запуск тестов (маркер benchmark):
+        pytest -m benchmark tests/test_benchmarks.py
+"""
+import json
+import os
+import random
+import time
+from os.path import dirname, join
+
+import pytest
+from api.tokens import confirmation_code_generator
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from reviews.leaderboards import rebuild_all_leaderboards
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title, User)
+
+BASELINE_PATH = join(dirname(__file__), 'benchmark_baseline.json')
+SCALE = int(os.getenv('BENCHMARK_SCALE', 1))
+REPEAT = int(os.getenv('BENCHMARK_REPEAT', 5))
+BYTES_TOLERANCE = float(os.getenv('BENCHMARK_BYTES_TOLERANCE', 0.1))
+LATENCY_TOLERANCE = float(os.getenv('BENCHMARK_LATENCY_TOLERANCE', 2.0))
+
+# (метод, имя маршрута, параметры запроса, тело запроса)
+CASES = (
+    ('get', 'user-list', '', None),
+    ('get', 'user-detail', '', None),
+    ('get', 'user-me', '', None),
+    ('patch', 'user-me', '', {'bio': 'Новая биография'}),
+    ('get', 'categories-list', '', None),
+    ('get', 'categories-list', '?search=Катег', None),
+    ('post', 'categories-list', '', {'name': 'Новая', 'slug': 'new'}),
+    ('delete', 'categories-detail', '', None),
+    ('post', 'categories-list', '', [
+        {'name': f'Новая {i}', 'slug': f'new{i}'} for i in range(20)
+    ]),
+    ('get', 'genres-list', '', None),
+    ('post', 'genres-list', '', {'name': 'Новый', 'slug': 'new'}),
+    ('delete', 'genres-detail', '', None),
+    ('post', 'genres-list', '', [
+        {'name': f'Новый {i}', 'slug': f'new{i}'} for i in range(20)
+    ]),
+    ('get', 'titles-list', '', None),
+    ('get', 'titles-list', '?genre=genre0&year=2000', None),
+    ('get', 'titles-list', '?pagination=cursor', None),
+    ('get', 'titles-list', '?category=cat0&rating__gte=5&ordering=-rating',
+     None),
+    ('post', 'titles-list', '', {
+        'name': 'Новое', 'year': 2000, 'category': 'cat0',
+        'genre': ['genre0', 'genre1'],
+    }),
+    ('post', 'titles-list', '', [
+        {
+            'name': f'Новое {i}', 'year': 2000, 'category': f'cat{i % 5}',
+            'genre': [f'genre{i % 10}', f'genre{i % 7}'],
+        }
+        for i in range(20)
+    ]),
+    ('get', 'titles-detail', '', None),
+    ('get', 'leaderboards-list', '', None),
+    ('get', 'export', '', None),
+    ('get', 'export', '?format=csv', None),
+    ('patch', 'titles-detail', '', {'name': 'Другое', 'category': 'cat1'}),
+    ('delete', 'titles-detail', '', None),
+    ('get', 'reviews-list', '', None),
+    ('post', 'reviews-list', '', {'text': 'Отзыв', 'score': 7}),
+    ('get', 'reviews-detail', '', None),
+    ('patch', 'reviews-detail', '', {'score': 3}),
+    ('delete', 'reviews-detail', '', None),
+    ('get', 'comment-list', '', None),
+    ('post', 'comment-list', '', {'text': 'Комментарий'}),
+    ('get', 'comment-detail', '', None),
+    ('delete', 'comment-detail', '', None),
+    ('post', 'user_create', '', {
+        'username': 'newuser', 'email': 'newuser@yamdb.fake'
+    }),
+    ('post', 'confirm_user', '', None),
+)
+
+
+def seed_dataset(scale):
+    """Детерминированный набор данных, размер задается `scale`."""
+    rnd = random.Random(0)
+    User.objects.bulk_create(
+        User(username=f'user{i}', email=f'user{i}@yamdb.fake')
+        for i in range(20 * scale)
+    )
+    # bulk_create на SQLite не заполняет pk, объекты перечитываются
+    Category.objects.bulk_create(
+        Category(name=f'Категория {i}', slug=f'cat{i}') for i in range(5)
+    )
+    categories = list(Category.objects.order_by('pk'))
+    Genre.objects.bulk_create(
+        Genre(name=f'Жанр {i}', slug=f'genre{i}') for i in range(10)
+    )
+    Title.objects.bulk_create(
+        Title(
+            name=f'Произведение {i}',
+            year=rnd.randint(1990, 2020) if i % 3 else 2000,
+            category=rnd.choice(categories),
+        )
+        for i in range(50 * scale)
+    )
+    # админ из фикстуры admin_client в авторы отзывов не попадает
+    users = list(User.objects.exclude(role=User.ADMIN).order_by('pk'))
+    titles = list(Title.objects.order_by('pk'))
+    genres = list(Genre.objects.order_by('pk'))
+    GenreTitle.objects.bulk_create(
+        GenreTitle(title=title, genre=genre)
+        for title in titles
+        for genre in rnd.sample(genres, rnd.randint(1, 3))
+    )
+    Review.objects.bulk_create(
+        Review(title=title, author=author, text='Отзыв' * 10,
+               score=rnd.randint(1, 10))
+        for title in titles
+        for author in rnd.sample(users, rnd.randint(1, 5))
+    )
+    Comment.objects.bulk_create(
+        Comment(review=review, author=rnd.choice(users), text='Комментарий')
+        for review in Review.objects.order_by('pk')
+        for _ in range(rnd.randint(0, 3))
+    )
+    Title.objects.recalculate_ratings()
+    rebuild_all_leaderboards()
+
+
+def route_kwargs(name):
+    review = Review.objects.order_by('pk').first()
+    comment = Comment.objects.order_by('pk').first()
+    kwargs = {
+        'user-detail': {'username': 'user0'},
+        'categories-detail': {'slug': 'cat0'},
+        'genres-detail': {'slug': 'genre0'},
+        'titles-detail': {'pk': review.title_id},
+        'leaderboards-list': {'kind': 'categories', 'slug': 'cat0'},
+        'export': {'name': 'titles'},
+        'reviews-list': {'title_id': review.title_id},
+        'reviews-detail': {'title_id': review.title_id, 'pk': review.pk},
+        'comment-list': {
+            'title_id': comment.review.title_id,
+            'review_id': comment.review_id,
+        },
+        'comment-detail': {
+            'title_id': comment.review.title_id,
+            'review_id': comment.review_id,
+            'pk': comment.pk,
+        },
+    }
+    return kwargs.get(name, {})
+
+
+def route_names():
+    """Имена всех маршрутов api/urls.py."""
+    _, resolver = get_resolver().namespace_dict['api']
+    return {name for name in resolver.reverse_dict if isinstance(name, str)}
+
+
+def load_baselines():
+    """Baseline по базам данных: {vendor: {'scale': ..., 'results': ...}}."""
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as file:
+        return json.load(file)
+
+
+def save_baselines(baselines):
+    with open(BASELINE_PATH, 'w') as file:
+        json.dump(
+            baselines, file, indent=2, ensure_ascii=False, sort_keys=True
+        )
+        file.write('\n')
+
+
+def percentile(timings, percent):
+    ordered = sorted(timings)
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def measure(client, method, url, data):
+    timings = []
+    for _ in range(REPEAT):
+        cache.clear()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                # Пакеты передаются списком, он есть только в JSON
+                response = getattr(client, method)(
+                    url, data,
+                    format='json' if isinstance(data, list) else 'multipart',
+                )
+                # Потоковый ответ читает базу при чтении тела
+                content = (
+                    b''.join(response.streaming_content)
+                    if response.streaming else response.content
+                )
+                timings.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+    assert response.status_code < 400, (
+        f'Проверьте, что {method.upper()}-запрос на `{url}` выполняется '
+        f'успешно, получен статус {response.status_code}'
+    )
+    return {
+        'queries': len(context.captured_queries),
+        'bytes': len(content),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+    }
+
+
+def compare(key, result, expected):
+    errors = []
+    if result['queries'] > expected['queries']:
+        errors.append(
+            f'{key}: запросов {result["queries"]}, '
+            f'в baseline {expected["queries"]}'
+        )
+    if abs(result['bytes'] - expected['bytes']) > (
+        expected['bytes'] * BYTES_TOLERANCE
+    ):
+        errors.append(
+            f'{key}: размер ответа {result["bytes"]}, '
+            f'в baseline {expected["bytes"]}'
+        )
+    if os.getenv('BENCHMARK_STRICT_LATENCY') == '1' and result['p95_ms'] > (
+        expected['p95_ms'] * LATENCY_TOLERANCE
+    ):
+        errors.append(
+            f'{key}: p95 {result["p95_ms"]}ms, '
+            f'в baseline {expected["p95_ms"]}ms'
+        )
+    return errors
+
+
+@pytest.mark.django_db
+class TestBenchmarks:
+
+    def test_every_route_is_benchmarked(self):
+        assert route_names() <= {name for _, name, _, _ in CASES}, (
+            'Проверьте, что для каждого маршрута api/urls.py '
+            'есть замер в CASES'
+        )
+
+    @pytest.mark.benchmark
+    def test_endpoints_against_baseline(self, admin_client):
+        seed_dataset(SCALE)
+        confirm_data = {
+            'username': 'user0',
+            'confirmation_code': confirmation_code_generator.make_code(
+                User.objects.get(username='user0')
+            ),
+        }
+
+        results = {}
+        for method, name, query, data in CASES:
+            url = reverse(f'api:{name}', kwargs=route_kwargs(name)) + query
+            if name == 'confirm_user':
+                data = confirm_data
+            key = f'{method.upper()} {name}{query}'
+            if isinstance(data, list):
+                key += ' [bulk]'
+            results[key] = measure(admin_client, method, url, data)
+
+        for key, result in results.items():
+            print(
+                f'{key:<50} queries={result["queries"]:<3} '
+                f'p50={result["p50_ms"]:>7}ms p95={result["p95_ms"]:>7}ms '
+                f'bytes={result["bytes"]}'
+            )
+        report = {'scale': SCALE, 'results': results}
+        if os.getenv('BENCHMARK_REPORT'):
+            with open(os.getenv('BENCHMARK_REPORT'), 'w') as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
+
+        baselines = load_baselines()
+        if os.getenv('BENCHMARK_UPDATE_BASELINE') == '1':
+            baselines[connection.vendor] = report
+            save_baselines(baselines)
+            return
+
+        baseline = baselines.get(connection.vendor)
+        assert baseline is not None, (
+            f'Проверьте, что в baseline есть замеры для {connection.vendor}, '
+            'обновите его с BENCHMARK_UPDATE_BASELINE=1'
+        )
+        errors = []
+        for key, result in results.items():
+            expected = baseline['results'].get(key)
+            assert expected is not None, (
+                f'Проверьте, что замер `{key}` есть в baseline, '
+                'обновите его с BENCHMARK_UPDATE_BASELINE=1'
+            )
+            if baseline['scale'] != SCALE:
+                # Размер ответа и время сравнимы только на тех же данных
+                expected = dict(
+                    expected, bytes=result['bytes'], p95_ms=result['p95_ms']
+                )
+            errors.extend(compare(key, result, expected))
+        assert not errors, (
+            'Проверьте регрессии производительности:\n' + '\n'.join(errors)
+        )
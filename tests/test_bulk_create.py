@@ -0,0 +1,186 @@
+import pytest
+from api.serializers import BulkListSerializer, TitleSerializer
+from api.views import GenreViewSet
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from reviews.models import (Category, Genre, GenreTitle, LeaderboardEntry,
+                            Review, Title, User)
+
+
+def post_bulk(client, url, items):
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(url, items, format='json')
+    return response, len(context.captured_queries)
+
+
+@pytest.mark.django_db
+class TestBulkCreate:
+
+    def test_genres_bulk_query_count_is_constant(self, admin_client):
+        url = '/api/v1/genres/'
+        small, small_queries = post_bulk(admin_client, url, [
+            {'name': f'Жанр {i}', 'slug': f'genre{i}'} for i in range(2)
+        ])
+        large, large_queries = post_bulk(admin_client, url, [
+            {'name': f'Жанр {i}', 'slug': f'genre{i}'} for i in range(2, 22)
+        ])
+
+        assert (small.status_code, large.status_code) == (201, 201), (
+            'Проверьте, что POST-запрос на `/api/v1/genres/` '
+            'возвращает статус 201'
+        )
+        assert large.json()[0] == {'name': 'Жанр 2', 'slug': 'genre2'}
+        assert Genre.objects.count() == 22
+        assert small_queries == large_queries, (
+            'Проверьте, что количество запросов пакетного создания '
+            'не зависит от размера пакета'
+        )
+
+    def test_errors_are_reported_per_item(self, admin_client):
+        Category.objects.create(name='Фильм', slug='movie')
+
+        response = admin_client.post('/api/v1/categories/', [
+            {'name': 'Книга', 'slug': 'book'},
+            {'name': 'Фильм', 'slug': 'movie'},
+            {'name': 'Музыка', 'slug': 'music'},
+            {'name': 'Музыка', 'slug': 'music'},
+            {'name': 'Без slug'},
+        ], format='json')
+
+        assert response.status_code == 400
+        errors = response.json()
+        assert [sorted(item) for item in errors] == [
+            [], ['slug'], ['slug'], ['slug'], ['slug']
+        ], (
+            'Проверьте, что ошибки пакета перечислены по объектам: '
+            'существующий slug, повтор в пакете, пропущенное поле'
+        )
+        assert Category.objects.count() == 1, (
+            'Проверьте, что пакет с ошибками не создает ни одного объекта'
+        )
+
+    def test_titles_bulk(self, admin_client):
+        Category.objects.create(name='Фильм', slug='movie')
+        for i in range(3):
+            Genre.objects.create(name=f'Жанр {i}', slug=f'genre{i}')
+
+        def titles(start, stop):
+            return [
+                {
+                    'name': f'Произведение {i}', 'year': 2000,
+                    'category': 'movie', 'genre': ['genre0', f'genre{i % 3}'],
+                }
+                for i in range(start, stop)
+            ]
+
+        small, small_queries = post_bulk(
+            admin_client, '/api/v1/titles/', titles(0, 2)
+        )
+        large, large_queries = post_bulk(
+            admin_client, '/api/v1/titles/', titles(2, 22)
+        )
+
+        assert (small.status_code, large.status_code) == (201, 201)
+        created = large.json()
+        assert created[1]['name'] == 'Произведение 3'
+        assert created[1]['category']['slug'] == 'movie'
+        assert [genre['slug'] for genre in created[1]['genre']] == [
+            'genre0'
+        ], 'Проверьте, что повторяющиеся жанры произведения не дублируются'
+        assert GenreTitle.objects.count() == 2 * 2 - 1 + 20 * 2 - 7
+        if connection.features.can_return_ids_from_bulk_insert:
+            assert small_queries == large_queries, (
+                'Проверьте, что количество запросов пакетного создания '
+                'произведений не зависит от размера пакета'
+            )
+
+    def test_bulk_slug_is_ordinary(self, admin_client):
+        response = admin_client.post(
+            '/api/v1/categories/', {'name': 'Пакет', 'slug': 'bulk'},
+            format='json',
+        )
+        assert response.status_code == 201
+        response = admin_client.delete('/api/v1/categories/bulk/')
+        assert response.status_code == 204, (
+            'Проверьте, что пакетное создание не перекрывает маршрут '
+            'категории со slug `bulk`'
+        )
+        assert not Category.objects.exists()
+
+    def test_nested_serializers_are_not_bulk(self):
+        assert not isinstance(
+            TitleSerializer().fields['genre'], BulkListSerializer
+        ), (
+            'Проверьте, что BulkListSerializer используется только '
+            'в сериализаторах пакетного создания'
+        )
+
+    def test_titles_bulk_unknown_slugs(self, admin_client):
+        Category.objects.create(name='Фильм', slug='movie')
+        Genre.objects.create(name='Драма', slug='drama')
+
+        response = admin_client.post('/api/v1/titles/', [
+            {'name': 'А', 'year': 2000, 'category': 'movie',
+             'genre': ['drama']},
+            {'name': 'Б', 'year': 2000, 'category': 'book'},
+            {'name': 'В', 'year': 2000, 'category': 'movie',
+             'genre': ['drama', 'comedy']},
+        ], format='json')
+
+        assert response.status_code == 400
+        assert [sorted(item) for item in response.json()] == [
+            [], ['category'], ['genre']
+        ], 'Проверьте, что неизвестные slug отмечаются у своих объектов'
+        assert not Title.objects.exists()
+
+    def test_bulk_permissions_and_limits(self, client, admin_client,
+                                         monkeypatch):
+        items = [{'name': f'Жанр {i}', 'slug': f'genre{i}'} for i in range(3)]
+        response = client.post(
+            '/api/v1/genres/', items, content_type='application/json'
+        )
+        assert response.status_code == 401, (
+            'Проверьте, что пакетное создание доступно только администратору'
+        )
+
+        monkeypatch.setattr(GenreViewSet, 'bulk_max_items', 2)
+        response = admin_client.post(
+            '/api/v1/genres/', items, format='json'
+        )
+        assert response.status_code == 400, (
+            'Проверьте, что размер пакета ограничен `bulk_max_items`'
+        )
+        assert admin_client.post(
+            '/api/v1/genres/', [], format='json'
+        ).status_code == 400, 'Проверьте, что пустой пакет отклоняется'
+
+
+# Таблицы лидеров перестраиваются после коммита
+@pytest.mark.django_db(transaction=True)
+class TestBulkCreateLeaderboards:
+
+    def test_titles_bulk_rebuilds_leaderboards(self, admin_client):
+        movie = Category.objects.create(name='Фильм', slug='movie')
+        Genre.objects.create(name='Драма', slug='drama')
+        title = Title.objects.create(name='А', year=2000, category=movie)
+        author = User.objects.create(username='author', email='a@yamdb.fake')
+        Review.objects.create(
+            title=title, author=author, text='Отзыв', score=7
+        )
+        # Таблицы разошлись с рейтингом, например после загрузки данных
+        LeaderboardEntry.objects.all().delete()
+
+        response = admin_client.post('/api/v1/titles/', [
+            {'name': 'Б', 'year': 2000, 'category': 'movie',
+             'genre': ['drama']},
+        ], format='json')
+
+        assert response.status_code == 201
+        assert list(
+            LeaderboardEntry.objects.values_list('kind', 'slug', 'title_id')
+        ) == [(LeaderboardEntry.CATEGORY, 'movie', title.pk)], (
+            'Проверьте, что пакетное создание произведений перестраивает '
+            'таблицы лидеров категорий и жанров пакета'
+        )
@@ -0,0 +1,92 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from reviews.models import Comment, Review, Title, User
+
+
+def create_review():
+    title = Title.objects.create(name='Произведение', year=2000)
+    author = User.objects.create(username='author', email='a@yamdb.fake')
+    review = Review.objects.create(
+        title=title, author=author, text='Отзыв', score=5
+    )
+    return review
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    def urls(self, review):
+        return [
+            f'/api/v1/titles/{review.title_id}/reviews/',
+            f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/',
+            f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/comments/',
+            '/api/v1/titles/',
+            '/api/v1/genres/',
+            '/api/v1/categories/',
+        ]
+
+    def test_if_none_match_returns_304(self, client):
+        review = create_review()
+        for url in self.urls(review):
+            response = client.get(url)
+            assert response.status_code == 200
+            assert response.has_header('ETag'), (
+                f'Проверьте, что ответ на `{url}` содержит ETag'
+            )
+
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+
+            assert response.status_code == 304, (
+                f'Проверьте, что `{url}` с актуальным ETag возвращает 304'
+            )
+            assert len(context.captured_queries) == 0, (
+                'Проверьте, что ответ 304 отдается без запросов к базе'
+            )
+
+    def test_no_last_modified(self, client):
+        review = create_review()
+        url = f'/api/v1/titles/{review.title_id}/reviews/'
+        response = client.get(url)
+        assert not response.has_header('Last-Modified'), (
+            'Проверьте, что Last-Modified с точностью до секунды не отдается'
+        )
+
+        response = client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 2099 00:00:00 GMT'
+        )
+        assert response.status_code == 200, (
+            'Проверьте, что `If-Modified-Since` без ETag не дает ответ 304'
+        )
+
+    def test_no_etag_with_local_cache_and_many_workers(self, client,
+                                                       settings):
+        settings.GUNICORN_WORKERS = 3
+        review = create_review()
+
+        response = client.get(f'/api/v1/titles/{review.title_id}/reviews/')
+
+        assert response.status_code == 200
+        assert not response.has_header('ETag'), (
+            'Проверьте, что ETag не отдается, если счетчики поколений '
+            'хранятся в локальном кэше каждого воркера'
+        )
+
+    # Версии моделей увеличиваются после коммита записи
+    @pytest.mark.django_db(transaction=True)
+    def test_write_changes_etag(self, client):
+        review = create_review()
+        url = f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/comments/'
+        etag = client.get(url)['ETag']
+
+        Comment.objects.create(review=review, author=review.author, text='К')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200, (
+            'Проверьте, что после нового комментария ETag меняется'
+        )
+        assert response.json()['count'] == 1
+        assert response['ETag'] != etag
@@ -0,0 +1,127 @@
+import csv
+import json
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from reviews.models import Category, Genre, GenreTitle, Review, Title, User
+
+
+def read_stream(response):
+    assert response.status_code == 200
+    assert response.streaming, (
+        'Проверьте, что выгрузка отдается потоковым ответом'
+    )
+    return b''.join(response.streaming_content).decode()
+
+
+def create_titles(count):
+    movie = Category.objects.get_or_create(name='Фильм', slug='movie')[0]
+    genres = [
+        Genre.objects.get_or_create(name=slug, slug=slug)[0]
+        for slug in ('drama', 'comedy')
+    ]
+    start = Title.objects.count()
+    for i in range(start, start + count):
+        title = Title.objects.create(
+            name=f'Произведение {i}', year=2000, category=movie
+        )
+        for genre in genres[:i % 3]:
+            GenreTitle.objects.create(title=title, genre=genre)
+
+
+@pytest.mark.django_db
+class TestExport:
+
+    def test_titles_ndjson(self, admin_client):
+        create_titles(3)
+        author = User.objects.create(username='author', email='a@yamdb.fake')
+        Review.objects.create(
+            title=Title.objects.get(name='Произведение 1'), author=author,
+            text='Отзыв', score=8,
+        )
+
+        response = admin_client.get('/api/v1/export/titles/')
+
+        assert response['Content-Type'].startswith('application/x-ndjson')
+        rows = [
+            json.loads(line) for line in read_stream(response).splitlines()
+        ]
+        assert [row['name'] for row in rows] == [
+            'Произведение 0', 'Произведение 1', 'Произведение 2'
+        ]
+        assert [row['genre'] for row in rows] == [
+            [], ['drama'], ['comedy', 'drama']
+        ], 'Проверьте, что в выгрузке произведений есть slug всех жанров'
+        assert (rows[1]['category'], rows[1]['rating']) == ('movie', 8)
+        assert rows[0]['rating'] is None
+
+    def test_reviews_and_comments_csv(self, admin_client):
+        create_titles(1)
+        author = User.objects.create(username='author', email='a@yamdb.fake')
+        review = Review.objects.create(
+            title=Title.objects.get(), author=author, text='Отзыв', score=8
+        )
+        comment = review.comments.create(author=author, text='Да, "именно"')
+
+        response = admin_client.get('/api/v1/export/reviews/?format=csv')
+        assert response['Content-Type'].startswith('text/csv')
+        reviews = list(csv.DictReader(read_stream(response).splitlines()))
+        assert reviews == [{
+            'id': str(review.pk), 'title_id': str(review.title_id),
+            'author': 'author', 'text': 'Отзыв', 'score': '8',
+            'pub_date': reviews[0]['pub_date'],
+        }]
+
+        response = admin_client.get(
+            '/api/v1/export/comments/', HTTP_ACCEPT='text/csv'
+        )
+        comments = list(csv.DictReader(read_stream(response).splitlines()))
+        assert [
+            (row['review_id'], row['title_id'], row['text'])
+            for row in comments
+        ] == [(str(review.pk), str(review.title_id), comment.text)], (
+            'Проверьте, что формат выгрузки выбирается заголовком Accept'
+        )
+
+    def test_query_count_is_constant(self, admin_client):
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                read_stream(admin_client.get('/api/v1/export/titles/'))
+            return len(context.captured_queries)
+
+        create_titles(3)
+        few = count_queries()
+        create_titles(30)
+        assert count_queries() == few, (
+            'Проверьте, что количество запросов выгрузки '
+            'не зависит от количества произведений и их жанров'
+        )
+
+    def test_admin_only(self, client, user_client):
+        assert client.get('/api/v1/export/titles/').status_code == 401
+        user = User.objects.create(username='user', email='u@yamdb.fake')
+        response = user_client(user).get(
+            '/api/v1/export/titles/?format=csv'
+        )
+        assert response.status_code == 403, (
+            'Проверьте, что выгрузка доступна только администратору'
+        )
+        assert response.content.startswith(b'detail'), (
+            'Проверьте, что ошибка выгрузки отдается в запрошенном формате'
+        )
+
+    def test_export_data_command(self, tmp_path):
+        create_titles(3)
+        output = tmp_path / 'titles.csv'
+
+        call_command(
+            'export_data', 'titles', '--format', 'csv', '--chunk-size', '2',
+            '--output', str(output),
+        )
+
+        rows = list(csv.DictReader(output.read_text().splitlines()))
+        assert [row['genre'] for row in rows] == ['', 'drama', 'comedy,drama']
@@ -0,0 +1,74 @@
+import os
+from collections import Counter
+
+import pytest
+from django.core.management import call_command
+from django.db.models import F
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title, User)
+
+SIZES = {
+    'users': 30, 'categories': 3, 'genres': 6, 'titles': 40,
+    'reviews': 300, 'comments': 500,
+}
+
+
+def generate(**options):
+    call_command(
+        'generate_data', '--end-date', '2022-01-01', **SIZES, **options
+    )
+
+
+def read_files(directory):
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), encoding='utf-8') as file:
+            files[name] = file.read()
+    return files
+
+
+class TestGenerateCsv:
+
+    def test_same_seed_same_data(self, tmp_path):
+        generate(output=str(tmp_path / 'a'), seed=1)
+        generate(output=str(tmp_path / 'b'), seed=1)
+        generate(output=str(tmp_path / 'c'), seed=2)
+
+        first = read_files(tmp_path / 'a')
+        assert len(first) == 7
+        assert first == read_files(tmp_path / 'b'), (
+            'Проверьте, что при одинаковом `--seed` данные совпадают'
+        )
+        assert first != read_files(tmp_path / 'c')
+
+
+@pytest.mark.django_db
+class TestGenerateDatabase:
+
+    def test_counts_and_skew(self):
+        generate()
+
+        assert [
+            User.objects.count(), Category.objects.count(),
+            Genre.objects.count(), Title.objects.count(),
+            Review.objects.count(), Comment.objects.count(),
+        ] == [30, 3, 6, 40, 300, 500]
+        assert GenreTitle.objects.count() >= 40
+
+        reviews = Counter(Review.objects.values_list('title_id', flat=True))
+        counts = sorted(reviews.values(), reverse=True)
+        assert counts[0] == 30 and counts[len(counts) // 2] < 10, (
+            'Проверьте, что отзывы распределены по произведениям '
+            'неравномерно'
+        )
+        assert Title.objects.filter(review_count__gt=0).count() == len(counts)
+
+    def test_csv_loads_with_initdata(self, tmp_path):
+        generate(output=str(tmp_path))
+
+        call_command('initdata', data_dir=str(tmp_path), workers=1)
+
+        assert (Review.objects.count(), Comment.objects.count()) == (300, 500)
+        assert not Comment.objects.filter(
+            pub_date__lt=F('review__pub_date')
+        ).exists(), 'Проверьте, что комментарий не раньше отзыва'
@@ -0,0 +1,74 @@
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from reviews.management.commands.initdata import (get_dependencies,
+                                                  get_load_order)
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title, User)
+
+
+class TestLoadOrder:
+
+    def test_independent_models_share_level(self):
+        models = [Comment, Review, GenreTitle, Title, Genre, Category, User]
+
+        levels = get_load_order(get_dependencies(models))
+
+        assert [set(level) for level in levels] == [
+            {User, Category, Genre},
+            {Title},
+            {GenreTitle, Review},
+            {Comment},
+        ], (
+            'Проверьте, что модели загружаются по графу внешних ключей, '
+            'а независимые модели попадают на один уровень'
+        )
+
+    def test_only_listed_models_are_ordered(self):
+        levels = get_load_order(get_dependencies([Comment, Review]))
+
+        assert levels == [[Review], [Comment]]
+
+
+@pytest.mark.django_db
+class TestInitdata:
+
+    def test_load_all_models(self):
+        call_command('initdata', chunk_size=10)
+        call_command('initdata', '--models', 'Review', chunk_size=10)
+
+        assert (
+            User.objects.count(), Title.objects.count(),
+            Review.objects.count(), Comment.objects.count(),
+        ) == (5, 32, 72, 3), (
+            'Проверьте, что `initdata` загружает и повторно обновляет данные'
+        )
+        for title in Title.objects.with_actual_ratings():
+            assert (title.rating_sum, title.review_count) == (
+                title.actual_sum, title.actual_count
+            ), 'Проверьте, что после загрузки отзывов пересчитан рейтинг'
+
+    def test_missing_required_column(self, tmp_path):
+        (tmp_path / 'titles.csv').write_text('id,name\n1,Без года\n')
+        options = [False]
+        if connection.vendor == 'postgresql':
+            options.append(True)
+
+        for fast in options:
+            with pytest.raises(CommandError, match='required fields: year'):
+                call_command(
+                    'initdata', '--models', 'Title', fast=fast,
+                    data_dir=str(tmp_path),
+                )
+        assert not Title.objects.exists(), (
+            'Проверьте, что файл без колонки обязательного поля '
+            'не загружается с NULL в этом поле'
+        )
+
+    @pytest.mark.skipif(
+        connection.vendor != 'postgresql',
+        reason='--fast работает только на PostgreSQL',
+    )
+    def test_fast_rejects_chunk_size(self):
+        with pytest.raises(CommandError, match='--chunk-size'):
+            call_command('initdata', fast=True, chunk_size=10)
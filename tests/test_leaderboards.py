@@ -0,0 +1,186 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from reviews.models import (Category, Genre, GenreTitle, LeaderboardEntry,
+                            Review, Title, User)
+
+CATEGORY_URL = '/api/v1/leaderboards/categories/movie/'
+GENRE_URL = '/api/v1/leaderboards/genres/drama/'
+
+
+def rate(title, *scores):
+    for score in scores:
+        author, _ = User.objects.get_or_create(
+            username=f'author{score}', email=f'a{score}@yamdb.fake'
+        )
+        Review.objects.create(
+            title=title, author=author, text='Отзыв', score=score
+        )
+
+
+def get_board(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что GET-запрос на `{url}` возвращает статус 200'
+    )
+    return [(item['position'], item['name']) for item in response.json()]
+
+
+# Таблицы перестраиваются после коммита, тестам нужны настоящие коммиты
+@pytest.mark.django_db(transaction=True)
+class TestLeaderboards:
+
+    @pytest.fixture
+    def titles(self, settings):
+        settings.LEADERBOARD_SIZE = 2
+        movie = Category.objects.create(name='Фильм', slug='movie')
+        drama = Genre.objects.create(name='Драма', slug='drama')
+        titles = {}
+        for name in ('А', 'Б', 'В'):
+            titles[name] = Title.objects.create(
+                name=name, year=2000, category=movie
+            )
+            GenreTitle.objects.create(title=titles[name], genre=drama)
+        return titles
+
+    def test_reviews_update_leaderboards(self, client, titles):
+        rate(titles['А'], 5)
+        rate(titles['Б'], 7)
+        assert get_board(client, CATEGORY_URL) == [(1, 'Б'), (2, 'А')], (
+            'Проверьте, что таблица лидеров категории строится '
+            'по убыванию рейтинга'
+        )
+
+        rate(titles['В'], 9)
+        expected = [(1, 'В'), (2, 'Б')]
+        assert get_board(client, CATEGORY_URL) == expected, (
+            'Проверьте, что произведение с рейтингом выше последнего места '
+            'попадает в таблицу, а таблица не длиннее LEADERBOARD_SIZE'
+        )
+        assert get_board(client, GENRE_URL) == expected, (
+            'Проверьте, что таблица лидеров жанра обновляется отзывами'
+        )
+
+        Review.objects.filter(title=titles['В']).delete()
+        assert get_board(client, GENRE_URL) == [(1, 'Б'), (2, 'А')], (
+            'Проверьте, что удаление отзывов убирает произведение '
+            'без рейтинга из таблицы лидеров'
+        )
+
+    def test_title_changes_update_leaderboards(self, client, titles):
+        rate(titles['А'], 5)
+        rate(titles['Б'], 7)
+
+        titles['А'].name = 'Новое название'
+        titles['А'].save()
+        assert get_board(client, CATEGORY_URL) == [
+            (1, 'Б'), (2, 'Новое название')
+        ], 'Проверьте, что переименование произведения обновляет таблицу'
+
+        titles['Б'].delete()
+        assert get_board(client, GENRE_URL) == [(1, 'Новое название')], (
+            'Проверьте, что удаленное произведение убирается из таблицы'
+        )
+
+    def test_same_position_updates_row_in_place(self, titles):
+        rate(titles['А'], 5)
+        rate(titles['Б'], 7)
+
+        with CaptureQueriesContext(connection) as context:
+            rate(titles['Б'], 9)
+        leaderboard_sql = [
+            query['sql'] for query in context.captured_queries
+            if 'reviews_leaderboardentry' in query['sql']
+            and not query['sql'].startswith('SELECT')
+        ]
+        assert len(leaderboard_sql) == 1, (
+            'Проверьте, что отзыв, не меняющий место произведения, '
+            'обновляет его строку таблицы одним запросом'
+        )
+        assert leaderboard_sql[0].startswith('UPDATE'), leaderboard_sql
+        assert not any(
+            'FOR UPDATE' in query['sql']
+            for query in context.captured_queries
+        ), 'Проверьте, что обновление строки не блокирует группу'
+        assert list(
+            LeaderboardEntry.objects.filter(
+                kind=LeaderboardEntry.CATEGORY
+            ).values_list('position', 'name', 'rating', 'review_count')
+        ) == [(1, 'Б', 8.0, 2), (2, 'А', 5.0, 1)]
+
+    def test_rebuild_waits_for_commit(self, client, titles):
+        rate(titles['А'], 5)
+        rate(titles['Б'], 7)
+
+        with transaction.atomic():
+            rate(titles['А'], 10)
+            assert get_board(client, CATEGORY_URL) == [(1, 'Б'), (2, 'А')], (
+                'Проверьте, что таблица перестраивается после коммита '
+                'транзакции, изменившей рейтинг'
+            )
+        assert get_board(client, CATEGORY_URL) == [(1, 'А'), (2, 'Б')]
+
+    def test_cascade_rebuilds_each_board_once(self, client, titles):
+        for title in titles.values():
+            rate(title, 9)
+        rate(titles['А'], 5)
+
+        with CaptureQueriesContext(connection) as context:
+            User.objects.get(username='author9').delete()
+
+        rebuilds = [
+            query for query in context.captured_queries
+            if query['sql'].startswith(
+                'DELETE FROM "reviews_leaderboardentry"'
+            )
+        ]
+        assert len(rebuilds) == 2, (
+            'Проверьте, что каскадное удаление отзывов перестраивает '
+            'каждую таблицу лидеров один раз'
+        )
+        assert get_board(client, CATEGORY_URL) == [(1, 'А')]
+
+    def test_unknown_group(self, client, titles):
+        assert get_board(client, CATEGORY_URL) == [], (
+            'Проверьте, что таблица лидеров категории без оценок пуста'
+        )
+        response = client.get('/api/v1/leaderboards/categories/unknown/')
+        assert response.status_code == 404, (
+            'Проверьте, что таблица лидеров несуществующей категории '
+            'возвращает статус 404'
+        )
+
+    def test_read_is_single_query(self, client, titles):
+        rate(titles['А'], 5)
+        with CaptureQueriesContext(connection) as context:
+            get_board(client, CATEGORY_URL)
+        assert len(context.captured_queries) == 1, (
+            'Проверьте, что таблица лидеров читается одним запросом'
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET LOCAL enable_seqscan = off; EXPLAIN '
+                    + context.captured_queries[0]['sql']
+                )
+                plan = ' '.join(row[0] for row in cursor.fetchall())
+            assert 'leaderboard_position' in plan and 'Sort' not in plan, (
+                'Проверьте, что таблица лидеров читается по индексу '
+                '(kind, slug, position) без сортировки'
+            )
+
+    def test_refresh_command_fixes_drift(self, client, titles):
+        rate(titles['А'], 5)
+        rate(titles['Б'], 7)
+        Title.objects.filter(pk=titles['А'].pk).update(rating=10)
+        LeaderboardEntry.objects.filter(kind=LeaderboardEntry.GENRE).delete()
+
+        call_command('refresh_leaderboards')
+
+        expected = [(1, 'А'), (2, 'Б')]
+        assert get_board(client, CATEGORY_URL) == expected, (
+            'Проверьте, что `refresh_leaderboards` перестраивает таблицы '
+            'по текущему рейтингу'
+        )
+        assert get_board(client, GENRE_URL) == expected
@@ -0,0 +1,97 @@
+import pytest
+from api.views import ReviewViewSet
+from reviews.models import Review, Title, User
+
+
+def walk_pages(client, url):
+    results, pages = [], 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, (
+            f'Проверьте, что GET-запрос на `{url}` возвращает статус 200'
+        )
+        data = response.json()
+        results.extend(data['results'])
+        url, pages = data['next'], pages + 1
+    return results, pages
+
+
+def create_reviews(count):
+    title = Title.objects.create(name='Произведение', year=2000)
+    for i in range(count):
+        author = User.objects.create(
+            username=f'author{i}', email=f'a{i}@yamdb.fake'
+        )
+        Review.objects.create(
+            title=title, author=author, text='Отзыв', score=5
+        )
+    return title
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+
+    def test_reviews_cursor_pages(self, client):
+        title = create_reviews(25)
+        url = f'/api/v1/titles/{title.pk}/reviews/'
+
+        default = client.get(url).json()
+        assert default['count'] == 25, (
+            'Проверьте, что по умолчанию используется пагинация по страницам'
+        )
+
+        results, pages = walk_pages(client, f'{url}?pagination=cursor')
+        assert pages == 3
+        assert [item['id'] for item in results] == list(
+            Review.objects.order_by('-pub_date', 'id').values_list(
+                'id', flat=True
+            )
+        ), (
+            'Проверьте, что keyset пагинация отзывов возвращает все отзывы '
+            'в порядке (-pub_date, id)'
+        )
+
+    def test_titles_cursor_pages(self, client):
+        for i in range(15):
+            Title.objects.create(name=f'Произведение {i % 3}', year=2000)
+
+        results, pages = walk_pages(client, '/api/v1/titles/?pagination=cursor')
+
+        assert pages == 2
+        assert [item['id'] for item in results] == list(
+            Title.objects.order_by('name', 'id').values_list('id', flat=True)
+        ), (
+            'Проверьте, что keyset пагинация произведений возвращает все '
+            'произведения в порядке (name, id)'
+        )
+
+
+@pytest.mark.django_db
+class TestCountModes:
+
+    def test_small_lists_keep_exact_count(self, client):
+        title = create_reviews(25)
+
+        data = client.get(f'/api/v1/titles/{title.pk}/reviews/').json()
+
+        assert data['count'] == 25, (
+            'Проверьте, что для небольших списков возвращается точный `count`'
+        )
+
+    def test_count_none_over_limit(self, client, monkeypatch):
+        monkeypatch.setattr(ReviewViewSet, 'count_mode', 'none')
+        monkeypatch.setattr(ReviewViewSet, 'exact_count_limit', 5, False)
+        title = create_reviews(25)
+
+        results, pages = walk_pages(
+            client, f'/api/v1/titles/{title.pk}/reviews/'
+        )
+        first_page = client.get(f'/api/v1/titles/{title.pk}/reviews/').json()
+
+        assert first_page['count'] is None, (
+            'Проверьте, что в режиме `none` большие списки возвращаются '
+            'без `count`'
+        )
+        assert (len(results), pages) == (25, 3), (
+            'Проверьте, что без `count` по ссылкам `next` доступны все отзывы'
+        )
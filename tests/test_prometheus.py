@@ -0,0 +1,91 @@
+import pytest
+from prometheus_client import REGISTRY
+from reviews.models import EmailOutbox, Title
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.django_db
+class TestPrometheusMetrics:
+
+    def test_metrics_endpoint(self, client, settings):
+        settings.REQUEST_METRICS_SAMPLE_RATE = 1
+        labels = {'route': 'TitleViewSet.list', 'method': 'GET'}
+        before = sample(
+            'yamdb_http_requests_total', status='200', **labels
+        )
+        client.get('/api/v1/titles/')
+        client.post(
+            '/api/v1/auth/signup/',
+            {'username': 'newuser', 'email': 'newuser@yamdb.fake'},
+        )
+
+        response = client.get('/metrics')
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        body = response.content.decode()
+        assert 'yamdb_email_outbox_pending 1.0' in body, (
+            'Проверьте, что /metrics показывает глубину очереди писем'
+        )
+        assert 'yamdb_db_queries_per_request_bucket' in body
+        assert sample(
+            'yamdb_http_requests_total', status='200', **labels
+        ) == before + 1, 'Проверьте, что запросы считаются по маршрутам'
+
+    def test_every_request_is_counted(self, client, settings):
+        settings.REQUEST_METRICS_SAMPLE_RATE = 0
+        labels = {'route': 'GenreViewSet.list', 'method': 'GET'}
+        requests = sample('yamdb_http_requests_total', status='200', **labels)
+        durations = sample('yamdb_http_request_duration_seconds_count',
+                           **labels)
+        queries = sample('yamdb_db_queries_per_request_count',
+                         route='GenreViewSet.list')
+
+        for _ in range(3):
+            client.get('/api/v1/genres/')
+
+        assert (
+            sample('yamdb_http_requests_total', status='200', **labels)
+            - requests,
+            sample('yamdb_http_request_duration_seconds_count', **labels)
+            - durations,
+        ) == (3, 3), (
+            'Проверьте, что счетчик и время ответа пишутся для каждого '
+            'запроса, а не по выборке'
+        )
+        assert sample('yamdb_db_queries_per_request_count',
+                      route='GenreViewSet.list') == queries
+
+    def test_failed_emails_use_setting(self, client, settings):
+        settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 2
+        EmailOutbox.objects.create(
+            subject='Тема', body='Текст', from_email='a@yamdb.fake',
+            to='b@yamdb.fake', attempts=2,
+        )
+
+        body = client.get('/metrics').content.decode()
+
+        assert 'yamdb_email_outbox_failed 1.0' in body, (
+            'Проверьте, что метрика неотправленных писем использует '
+            'настройку EMAIL_OUTBOX_MAX_ATTEMPTS'
+        )
+
+    def test_cache_hit_ratio(self, client):
+        Title.objects.create(name='Произведение', year=2000)
+        hits = sample('yamdb_cache_requests_total',
+                      cache='response', result='hit')
+        misses = sample('yamdb_cache_requests_total',
+                        cache='response', result='miss')
+
+        client.get('/api/v1/titles/')
+        client.get('/api/v1/titles/')
+
+        assert (
+            sample('yamdb_cache_requests_total',
+                   cache='response', result='hit') - hits,
+            sample('yamdb_cache_requests_total',
+                   cache='response', result='miss') - misses,
+        ) == (1, 1), 'Проверьте, что считаются попадания в кэш ответов'
@@ -0,0 +1,91 @@
+import socket
+
+import pytest
+from api.metrics import RequestMetrics, StatsdSink
+from reviews.models import Title
+
+
+class ListSink:
+    sent = []
+
+    def send(self, metrics):
+        self.sent.append(metrics)
+
+
+@pytest.fixture
+def sink(settings):
+    settings.REQUEST_METRICS_SAMPLE_RATE = 1
+    settings.REQUEST_METRICS_SINKS = [
+        {'BACKEND': 'tests.test_request_metrics.ListSink'}
+    ]
+    ListSink.sent = []
+    return ListSink
+
+
+@pytest.mark.django_db
+class TestRequestMetrics:
+
+    def test_metrics_are_recorded(self, client, sink):
+        Title.objects.create(name='Произведение', year=2000)
+
+        response = client.get('/api/v1/titles/')
+
+        assert response['Server-Timing'].startswith('db;dur='), (
+            'Проверьте, что ответ содержит заголовок `Server-Timing`'
+        )
+        metrics, = sink.sent
+        assert (metrics.route, metrics.method, metrics.status) == (
+            'TitleViewSet.list', 'GET', 200
+        ), 'Проверьте, что метрики группируются по вьюсету и действию'
+        assert metrics.queries > 0
+        assert f'desc="{metrics.queries} queries"' in (
+            response['Server-Timing']
+        )
+        assert metrics.response_bytes == len(response.content)
+        assert metrics.total_ms >= metrics.view_ms >= 0
+
+    def test_routes_of_api_views(self, client, sink):
+        client.post('/api/v1/auth/signup/', {})
+        client.get('/api/v1/unknown/')
+
+        assert [metrics.route for metrics in sink.sent] == [
+            'UserCreateAPIView.post', 'unknown'
+        ]
+
+    def test_unsampled_requests_skip_sql(self, client, sink, settings):
+        settings.REQUEST_METRICS_SAMPLE_RATE = 0
+
+        response = client.get('/api/v1/genres/')
+
+        metrics, = sink.sent
+        assert metrics.route == 'GenreViewSet.list', (
+            'Проверьте, что в приемники передается каждый запрос'
+        )
+        assert (metrics.queries, metrics.db_ms) == (None, None), (
+            'Проверьте, что SQL запросы замеряются только по выборке'
+        )
+        assert response['Server-Timing'].startswith('view;dur=')
+
+
+class TestStatsdSink:
+
+    def test_statsd_packet(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(1)
+        statsd = StatsdSink(host='127.0.0.1', port=server.getsockname()[1])
+
+        statsd.send(RequestMetrics(
+            route='TitleViewSet.list', method='GET', status=200, queries=3,
+            db_ms=1.5, view_ms=4.0, total_ms=5.0, response_bytes=100,
+            sample_rate=0.5,
+        ))
+
+        lines = server.recv(4096).decode().splitlines()
+        server.close()
+        assert lines[:2] == [
+            'yamdb.request.TitleViewSet.list.count:1|c',
+            'yamdb.request.TitleViewSet.list.status.200:1|c',
+        ]
+        assert 'yamdb.request.TitleViewSet.list.queries:3|h|@0.5' in lines
+        assert 'yamdb.request.TitleViewSet.list.total:5.000|ms' in lines
@@ -0,0 +1,118 @@
+import pytest
+from api.cache import get_generations
+from api.checks import shared_cache_check
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from reviews.models import (Category, EmailOutbox, Genre, GenreTitle, Review,
+                            Title, User)
+
+
+def get(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что GET-запрос на `{url}` возвращает статус 200'
+    )
+    return len(context.captured_queries), response.json()
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+
+    @pytest.mark.parametrize('url', [
+        '/api/v1/titles/?year=2000&name=Про',
+        '/api/v1/genres/',
+        '/api/v1/categories/',
+    ])
+    def test_repeated_read_is_cached(self, client, url):
+        Title.objects.create(name='Произведение', year=2000)
+
+        get(client, url)
+        queries, _ = get(client, url)
+
+        assert queries == 0, (
+            f'Проверьте, что повторный GET-запрос на `{url}` '
+            'отдается из кэша'
+        )
+
+    def test_query_params_are_normalized(self, client):
+        Title.objects.create(name='Произведение', year=2000)
+        get(client, '/api/v1/titles/?year=2000&name=Про')
+
+        queries, _ = get(client, '/api/v1/titles/?name=Про&year=2000')
+
+        assert queries == 0, (
+            'Проверьте, что порядок параметров запроса не влияет на ключ кэша'
+        )
+
+    # Версии моделей увеличиваются после коммита записи
+    @pytest.mark.django_db(transaction=True)
+    def test_writes_invalidate_titles(self, client):
+        title = Title.objects.create(name='Произведение', year=2000)
+        get(client, '/api/v1/titles/')
+
+        author = User.objects.create(username='author', email='a@yamdb.fake')
+        Review.objects.create(title=title, author=author, text='Т', score=7)
+        _, data = get(client, '/api/v1/titles/')
+        assert data['results'][0]['rating'] == 7, (
+            'Проверьте, что новый отзыв сбрасывает кэш произведений'
+        )
+
+        genre = Genre.objects.create(name='Жанр', slug='genre')
+        GenreTitle.objects.create(title=title, genre=genre)
+        _, data = get(client, f'/api/v1/titles/{title.pk}/')
+        assert data['genre'] == [{'name': 'Жанр', 'slug': 'genre'}], (
+            'Проверьте, что изменение жанров сбрасывает кэш произведений'
+        )
+
+        Category.objects.create(name='Фильм', slug='movie')
+        queries, data = get(client, '/api/v1/categories/')
+        assert queries > 0 and data['count'] == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_generation_changes_after_commit(self):
+        title = Title.objects.create(name='Произведение', year=2000)
+        author = User.objects.create(username='author', email='a@yamdb.fake')
+        before = get_generations(Review)
+
+        with transaction.atomic():
+            Review.objects.create(title=title, author=author, text='Т',
+                                  score=7)
+            assert get_generations(Review) == before, (
+                'Проверьте, что версии моделей не меняются до коммита: '
+                'иначе запрос до коммита закэширует старые данные '
+                'под новой версией'
+            )
+
+        assert get_generations(Review) != before, (
+            'Проверьте, что версии моделей меняются после коммита'
+        )
+
+    def test_local_cache_with_many_workers(self, client, settings):
+        settings.GUNICORN_WORKERS = 3
+        Title.objects.create(name='Произведение', year=2000)
+
+        get(client, '/api/v1/titles/')
+        queries, _ = get(client, '/api/v1/titles/')
+
+        assert queries > 0, (
+            'Проверьте, что с локальным кэшем нескольких воркеров '
+            'ответы не кэшируются: счетчики поколений не общие'
+        )
+        assert [
+            warning.id for warning in shared_cache_check(None)
+        ] == ['api.W001']
+
+    def test_delete_of_unversioned_model_is_fast(self):
+        EmailOutbox.objects.create(
+            subject='Тема', body='Текст', from_email='a@yamdb.fake',
+            to='b@yamdb.fake',
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            EmailOutbox.objects.all().delete()
+
+        assert len(context.captured_queries) == 1, (
+            'Проверьте, что обработчики версий подключены только к моделям '
+            'из кэша и не отключают быстрое удаление `QuerySet.delete()`'
+        )
@@ -0,0 +1,222 @@
+import threading
+
+import pytest
+from api.views import ReviewViewSet
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from reviews.models import Review, Title, User
+
+
+def post_review(client, title_id):
+    return client.post(
+        f'/api/v1/titles/{title_id}/reviews/',
+        {'text': 'Отзыв', 'score': 7},
+        format='json',
+    )
+
+
+@pytest.mark.django_db
+class TestReviewCreate:
+
+    def test_second_review_is_rejected(self, user_client):
+        title = Title.objects.create(name='Произведение', year=2000)
+        user = User.objects.create(username='author', email='a@yamdb.fake')
+        client = user_client(user)
+        assert post_review(client, title.pk).status_code == 201
+
+        with CaptureQueriesContext(connection) as context:
+            response = post_review(client, title.pk)
+
+        assert response.status_code == 400, (
+            'Проверьте, что повторный отзыв на произведение '
+            'возвращает статус 400'
+        )
+        assert 'Only one reviews in titles' in str(response.json())
+        assert not any(
+            query['sql'].startswith('SELECT') and '"reviews_review"' in
+            query['sql']
+            for query in context.captured_queries
+        ), (
+            'Проверьте, что единственность отзыва проверяет ограничение '
+            '`unique_title`, а не отдельный запрос'
+        )
+        assert Review.objects.count() == 1
+
+    def test_review_on_missing_title_in_transaction(self, user_client):
+        # Тест выполняется во внешней транзакции, как с ATOMIC_REQUESTS
+        user = User.objects.create(username='author', email='a@yamdb.fake')
+
+        response = post_review(user_client(user), 100500)
+
+        assert response.status_code == 404, (
+            'Проверьте, что отзыв на несуществующее произведение '
+            'возвращает статус 404 и внутри внешней транзакции'
+        )
+        assert not Review.objects.exists()
+
+    def test_review_on_invalid_title_id(self, user_client):
+        user = User.objects.create(username='author', email='a@yamdb.fake')
+
+        response = post_review(user_client(user), 'abc')
+
+        assert response.status_code == 404, (
+            'Проверьте, что отзыв на произведение с нечисловым id '
+            'возвращает статус 404'
+        )
+
+    @pytest.fixture
+    def race(self, monkeypatch):
+        """Выполняет `action` между валидацией и вставкой отзыва."""
+        def install(action):
+            perform_create = ReviewViewSet.perform_create
+
+            def racing_perform_create(view, serializer):
+                action()
+                perform_create(view, serializer)
+
+            monkeypatch.setattr(
+                ReviewViewSet, 'perform_create', racing_perform_create
+            )
+        return install
+
+    def test_duplicate_from_concurrent_request(self, user_client, race):
+        title = Title.objects.create(name='Произведение', year=2000)
+        user = User.objects.create(username='author', email='a@yamdb.fake')
+        race(lambda: Review.objects.create(
+            title=title, author=user, text='Отзыв', score=5
+        ))
+
+        response = post_review(user_client(user), title.pk)
+
+        assert response.status_code == 400, (
+            'Проверьте, что отзыв, который параллельный запрос успел '
+            'создать раньше, приводит к статусу 400'
+        )
+        assert 'Only one reviews in titles' in str(response.json())
+        assert Review.objects.count() == 1
+
+    def test_title_deleted_by_concurrent_request(self, user_client, race):
+        title = Title.objects.create(name='Произведение', year=2000)
+        user = User.objects.create(username='author', email='a@yamdb.fake')
+        race(title.delete)
+
+        response = post_review(user_client(user), title.pk)
+
+        assert response.status_code == 404, (
+            'Проверьте, что отзыв на произведение, удаленное параллельным '
+            'запросом, возвращает статус 404'
+        )
+        assert not Review.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestReviewCreateCommitted:
+
+    def test_review_on_missing_title(self, user_client):
+        user = User.objects.create(username='author', email='a@yamdb.fake')
+
+        response = post_review(user_client(user), 100500)
+
+        assert response.status_code == 404, (
+            'Проверьте, что отзыв на несуществующее произведение '
+            'возвращает статус 404'
+        )
+        assert not Review.objects.exists()
+
+    @pytest.mark.skipif(
+        connection.vendor == 'sqlite',
+        reason='sqlite блокирует базу целиком на запись',
+    )
+    def test_parallel_reviews(self, user_client):
+        title = Title.objects.create(name='Произведение', year=2000)
+        user = User.objects.create(username='author', email='a@yamdb.fake')
+        threads_count = 8
+        barrier = threading.Barrier(threads_count)
+        statuses = []
+
+        def worker():
+            client = user_client(user)
+            try:
+                barrier.wait()
+                statuses.append(post_review(client, title.pk).status_code)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker) for _ in range(threads_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(statuses) == [201] + [400] * (threads_count - 1), (
+            'Проверьте, что из параллельных отзывов одного автора '
+            'создается один, а остальные получают статус 400'
+        )
+        title.refresh_from_db()
+        assert (Review.objects.count(), title.review_count) == (1, 1), (
+            'Проверьте, что параллельные запросы не создают лишних отзывов '
+            'и не портят рейтинг'
+        )
+
+
+@pytest.mark.django_db
+class TestNestedRoutes:
+
+    @pytest.fixture
+    def comment(self):
+        author = User.objects.create(username='author', email='a@yamdb.fake')
+        title = Title.objects.create(name='Произведение', year=2000)
+        review = Review.objects.create(
+            title=title, author=author, text='Отзыв', score=5
+        )
+        return review.comments.create(author=author, text='Комментарий')
+
+    def test_review_must_belong_to_title(self, client, comment, user_client):
+        other = Title.objects.create(name='Другое', year=2000)
+        url = (
+            f'/api/v1/titles/{other.pk}/reviews/{comment.review_id}/comments/'
+        )
+
+        assert client.get(url).status_code == 404, (
+            'Проверьте, что комментарии отзыва, не относящегося '
+            'к произведению из URL, возвращают статус 404'
+        )
+        response = user_client(comment.author).post(
+            url, {'text': 'Комментарий'}, format='json'
+        )
+        assert response.status_code == 404, (
+            'Проверьте, что комментарий нельзя добавить к отзыву '
+            'через чужое произведение'
+        )
+
+    def test_parent_is_checked_with_one_query(self, client, comment):
+        url = (
+            f'/api/v1/titles/{comment.review.title_id}/reviews/'
+            f'{comment.review_id}/comments/'
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+
+        assert response.status_code == 200
+        review_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'FROM "reviews_review"' in query['sql']
+        ]
+        assert len(review_queries) == 1 and (
+            '"reviews_review"."text"' not in review_queries[0]
+        ), (
+            'Проверьте, что отзыв и произведение из URL проверяются '
+            'одним запросом на существование, без загрузки отзыва'
+        )
+
+    def test_created_comment(self, comment, user_client):
+        review = comment.review
+        response = user_client(comment.author).post(
+            f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/comments/',
+            {'text': 'Еще комментарий'},
+            format='json',
+        )
+        assert response.status_code == 201
+        assert response.json()['review'] == review.pk
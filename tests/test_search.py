@@ -0,0 +1,33 @@
+import pytest
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db
+class TestNameSearch:
+
+    @pytest.mark.parametrize('model, url', [
+        (Genre, '/api/v1/genres/'),
+        (Category, '/api/v1/categories/'),
+    ])
+    def test_search_is_case_insensitive_substring(self, client, model, url):
+        model.objects.create(name='Science fiction', slug='scifi')
+        model.objects.create(name='Fantasy', slug='fantasy')
+
+        response = client.get(url, {'search': 'FICT'})
+
+        assert [item['slug'] for item in response.json()['results']] == [
+            'scifi'
+        ], (
+            f'Проверьте, что поиск на `{url}` находит подстроку '
+            'без учета регистра'
+        )
+
+    def test_title_name_filter(self, client):
+        Title.objects.create(name='The Godfather', year=1972)
+        Title.objects.create(name='Godzilla', year=1954)
+
+        response = client.get('/api/v1/titles/', {'name': 'Godf'})
+
+        assert [item['name'] for item in response.json()['results']] == [
+            'The Godfather'
+        ], 'Проверьте, что фильтр `name` ищет подстроку в названии'
@@ -0,0 +1,163 @@
+import pytest
+from api.tokens import confirmation_code_generator
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from reviews.models import EmailOutbox, User
+
+
+class BrokenBackend:
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def open(self):
+        raise ConnectionError('SMTP relay is down')
+
+
+class InspectingBackend(BrokenBackend):
+    """Запоминает состояние базы в момент отправки письма."""
+    sends = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        self.sends.append((
+            connection.in_atomic_block,
+            EmailOutbox.objects.pending(max_attempts=5).exists(),
+        ))
+        return len(messages)
+
+
+@pytest.mark.django_db
+class TestSignupOutbox:
+
+    def signup(self, client):
+        response = client.post(
+            '/api/v1/auth/signup/',
+            {'username': 'newuser', 'email': 'newuser@yamdb.fake'},
+        )
+        assert response.status_code == 200, (
+            'Проверьте, что POST-запрос на `/api/v1/auth/signup/` '
+            'возвращает статус 200'
+        )
+
+    def test_signup_queues_email(self, client):
+        self.signup(client)
+
+        assert len(mail.outbox) == 0, (
+            'Проверьте, что письмо не отправляется во время запроса'
+        )
+        message = EmailOutbox.objects.get()
+        assert message.to == 'newuser@yamdb.fake'
+
+        call_command('send_outbox')
+
+        assert [email.to for email in mail.outbox] == [
+            ['newuser@yamdb.fake']
+        ], 'Проверьте, что `send_outbox` отправляет письма из очереди'
+        message.refresh_from_db()
+        assert message.sent_at is not None
+
+    def test_failed_email_is_retried_later(self, client, settings):
+        self.signup(client)
+        settings.EMAIL_BACKEND = 'tests.test_signup.BrokenBackend'
+
+        call_command('send_outbox', backoff=60)
+
+        message = EmailOutbox.objects.get()
+        assert (message.sent_at, message.attempts) == (None, 1)
+        assert 'SMTP relay is down' in message.last_error
+        assert not EmailOutbox.objects.pending(max_attempts=5).exists(), (
+            'Проверьте, что повторная отправка откладывается'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestSendOutbox:
+
+    def test_emails_are_sent_outside_transaction(self, settings):
+        settings.EMAIL_BACKEND = 'tests.test_signup.InspectingBackend'
+        InspectingBackend.sends = []
+        EmailOutbox.objects.create(
+            subject='Тема', body='Текст', from_email='no_replay@yambd.ru',
+            to='user@yamdb.fake',
+        )
+
+        call_command('send_outbox')
+
+        assert InspectingBackend.sends == [(False, False)], (
+            'Проверьте, что письма отправляются вне транзакции, '
+            'а забранная пачка не видна другим обработчикам'
+        )
+        message = EmailOutbox.objects.get()
+        assert message.sent_at is not None and message.attempts == 1
+
+
+@pytest.mark.django_db
+class TestConfirmationCode:
+
+    def get_token(self, client, code):
+        return client.post(
+            '/api/v1/auth/token/',
+            {'username': 'newuser', 'confirmation_code': code},
+        )
+
+    def test_code_from_email_gives_token(self, client):
+        TestSignupOutbox().signup(client)
+        code = EmailOutbox.objects.get().body
+
+        assert len(code) < 32, 'Проверьте, что код подтверждения короткий'
+        response = self.get_token(client, code)
+        assert response.status_code == 200, (
+            'Проверьте, что по коду из письма выдается токен'
+        )
+        assert 'token' in response.json()
+
+    @pytest.mark.parametrize('code', ['', 'abc', 'abc-def', '-', 'z' * 40])
+    def test_wrong_code_is_rejected(self, client, code):
+        TestSignupOutbox().signup(client)
+
+        response = self.get_token(client, code)
+
+        assert response.status_code == 400, (
+            'Проверьте, что неверный код подтверждения не принимается'
+        )
+
+    def test_expired_code_is_rejected(self, client, settings, monkeypatch):
+        TestSignupOutbox().signup(client)
+        code = EmailOutbox.objects.get().body
+        now = confirmation_code_generator._now()
+        monkeypatch.setattr(
+            confirmation_code_generator, '_now',
+            lambda: now + settings.CONFIRMATION_CODE_TIMEOUT + 1,
+        )
+
+        assert self.get_token(client, code).status_code == 400, (
+            'Проверьте, что просроченный код подтверждения не принимается'
+        )
+
+    def test_code_is_bound_to_user_data(self, client):
+        TestSignupOutbox().signup(client)
+        code = EmailOutbox.objects.get().body
+        User.objects.filter(username='newuser').update(
+            email='other@yamdb.fake'
+        )
+
+        assert self.get_token(client, code).status_code == 400, (
+            'Проверьте, что код перестает действовать при смене email'
+        )
+
+    def test_code_is_single_use(self, client):
+        TestSignupOutbox().signup(client)
+        code = EmailOutbox.objects.get().body
+
+        assert self.get_token(client, code).status_code == 200
+        assert self.get_token(client, code).status_code == 400, (
+            'Проверьте, что по одному коду подтверждения токен '
+            'выдается только один раз'
+        )
@@ -0,0 +1,375 @@
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from reviews.models import (Category, Genre, GenreTitle, Review, Title, User,
+                            deleting_title_ids)
+
+
+def create_titles(count, reviews_per_title=3):
+    category, _ = Category.objects.get_or_create(name='Фильм', slug='movie')
+    authors = [
+        User.objects.get_or_create(
+            username=f'author{i}', email=f'a{i}@yamdb.fake'
+        )[0]
+        for i in range(reviews_per_title)
+    ]
+    for i in range(count):
+        title = Title.objects.create(
+            name=f'Произведение {i:03}', year=2000, category=category
+        )
+        for score, author in enumerate(authors, start=1):
+            Review.objects.create(
+                title=title, author=author, text='Отзыв', score=score
+            )
+    return category
+
+
+def count_queries(client, url, table=None):
+    # Версии моделей для кэша ответов увеличиваются после коммита,
+    # а тест выполняется в транзакции: читаем мимо кэша
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что GET-запрос на `{url}` возвращает статус 200'
+    )
+    queries = [
+        query for query in context.captured_queries
+        if table is None or f'"{table}"' in query['sql']
+    ]
+    return len(queries), response.json()
+
+
+@pytest.mark.django_db
+class TestTitleRating:
+
+    def test_rating_value(self, client):
+        create_titles(1)
+        title = Title.objects.create(name='Без отзывов', year=2000)
+
+        response = client.get('/api/v1/titles/')
+        ratings = {item['name']: item['rating']
+                   for item in response.json()['results']}
+
+        assert ratings['Произведение 000'] == 2, (
+            'Проверьте, что `rating` - округленная средняя оценка отзывов'
+        )
+        assert ratings[title.name] is None, (
+            'Проверьте, что `rating` произведения без отзывов равен `null`'
+        )
+
+    def test_rating_query_count_does_not_grow(self, client):
+        create_titles(1)
+        small_page, _ = count_queries(
+            client, '/api/v1/titles/', table='reviews_review'
+        )
+        Title.objects.all().delete()
+        create_titles(10)
+        full_page, data = count_queries(
+            client, '/api/v1/titles/', table='reviews_review'
+        )
+
+        assert len(data['results']) == 10
+        assert small_page == full_page, (
+            'Проверьте, что средняя оценка на странице `/api/v1/titles/` '
+            'считается в запросе списка, а не отдельным запросом '
+            'для каждого произведения'
+        )
+
+
+@pytest.mark.django_db
+class TestTitleQueries:
+
+    def add_genres(self, count):
+        genres = [
+            Genre.objects.get_or_create(name=f'Жанр {i}', slug=f'genre{i}')[0]
+            for i in range(count)
+        ]
+        for title in Title.objects.all():
+            for genre in genres:
+                GenreTitle.objects.get_or_create(title=title, genre=genre)
+
+    @pytest.mark.parametrize('url', [
+        '/api/v1/titles/',
+        '/api/v1/titles/?genre=genre0',
+        '/api/v1/titles/?category=movie',
+        '/api/v1/titles/?name=Произв&year=2000',
+    ])
+    def test_list_query_count_is_constant(self, client, url):
+        create_titles(1, reviews_per_title=0)
+        self.add_genres(1)
+        small_page, _ = count_queries(client, url)
+
+        create_titles(10, reviews_per_title=0)
+        self.add_genres(5)
+        full_page, data = count_queries(client, url)
+
+        assert len(data['results']) == 10
+        assert all(len(item['genre']) == 5 for item in data['results'])
+        assert small_page == full_page, (
+            f'Проверьте, что количество запросов на странице `{url}` '
+            'не зависит от количества произведений и их жанров'
+        )
+
+    def post_title(self, client, genres):
+        data = {'name': f'Новое {len(genres)}', 'year': 2000,
+                'category': 'movie', 'genre': genres}
+        with CaptureQueriesContext(connection) as context:
+            response = client.post('/api/v1/titles/', data)
+        return response, len([
+            query for query in context.captured_queries
+            if '"reviews_genre"' in query['sql']
+            or '"reviews_category"' in query['sql']
+        ])
+
+    def test_create_query_count_is_constant(self, admin_client):
+        create_titles(1, reviews_per_title=0)
+        self.add_genres(5)
+        response, one_genre = self.post_title(admin_client, ['genre0'])
+        assert response.status_code == 201
+        response, many_genres = self.post_title(
+            admin_client, [f'genre{i}' for i in range(5)]
+        )
+
+        assert response.status_code == 201
+        assert len(response.json()['genre']) == 5
+        assert one_genre == many_genres, (
+            'Проверьте, что slug жанров и категории нового произведения '
+            'проверяются запросом на связь, а не на каждый slug'
+        )
+
+    def test_create_names_missing_genres(self, admin_client):
+        create_titles(1, reviews_per_title=0)
+        self.add_genres(1)
+
+        response, _ = self.post_title(
+            admin_client, ['genre0', 'missing1', 'missing2']
+        )
+
+        assert response.status_code == 400
+        errors = str(response.json())
+        assert 'missing1' in errors and 'missing2' in errors, (
+            'Проверьте, что ошибка перечисляет все несуществующие жанры'
+        )
+
+    def test_detail_query_count_is_constant(self, client):
+        create_titles(1, reviews_per_title=0)
+        title = Title.objects.get()
+        url = f'/api/v1/titles/{title.pk}/'
+        self.add_genres(1)
+        one_genre, _ = count_queries(client, url)
+
+        self.add_genres(5)
+        many_genres, data = count_queries(client, url)
+
+        assert data['category']['slug'] == 'movie'
+        assert one_genre == many_genres, (
+            'Проверьте, что количество запросов на странице произведения '
+            'не зависит от количества его жанров'
+        )
+
+
+@pytest.mark.django_db
+class TestStoredRating:
+
+    def test_rating_follows_review_changes(self):
+        create_titles(1, reviews_per_title=2)
+        title = Title.objects.get()
+        assert (title.rating_sum, title.review_count, title.rating) == (
+            3, 2, 1.5
+        ), 'Проверьте, что создание отзыва обновляет рейтинг произведения'
+
+        review = Review.objects.get(title=title, score=1)
+        review.score = 9
+        review.save()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.review_count, title.rating) == (
+            11, 2, 5.5
+        ), 'Проверьте, что изменение оценки обновляет рейтинг произведения'
+
+        Review.objects.filter(title=title).delete()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.review_count, title.rating) == (
+            0, 0, None
+        ), 'Проверьте, что удаление отзывов обновляет рейтинг произведения'
+
+    def test_rating_counts_rows_in_database(self):
+        create_titles(1, reviews_per_title=2)
+        title = Title.objects.get()
+        first = Review.objects.get(title=title, score=1)
+        stale = Review.objects.get(pk=first.pk)
+
+        first.score = 5
+        first.save()
+        stale.score = 3
+        stale.save()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.review_count) == (5, 2), (
+            'Проверьте, что изменение оценки считается от оценки в базе, '
+            'а не от загруженной в объект раньше'
+        )
+
+        first.delete()
+        stale.delete()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.review_count, title.rating) == (
+            2, 1, 2.0
+        ), 'Проверьте, что повторное удаление отзыва не меняет рейтинг'
+
+    def test_title_delete_skips_cascaded_reviews(self):
+        def count_delete_queries(reviews_per_title):
+            create_titles(1, reviews_per_title=reviews_per_title)
+            title = Title.objects.get()
+            with CaptureQueriesContext(connection) as context:
+                title.delete()
+            return len(context.captured_queries)
+
+        few = count_delete_queries(2)
+        assert count_delete_queries(10) == few, (
+            'Проверьте, что удаление произведения не пересчитывает '
+            'рейтинг для каждого удаляемого вместе с ним отзыва'
+        )
+        assert not deleting_title_ids()
+
+    def test_user_delete_updates_ratings(self):
+        create_titles(2, reviews_per_title=2)
+
+        User.objects.get(username='author1').delete()
+
+        assert list(
+            Title.objects.values_list('rating_sum', 'review_count', 'rating')
+        ) == [(1, 1, 1.0), (1, 1, 1.0)], (
+            'Проверьте, что удаление пользователя обновляет рейтинг '
+            'произведений, на которые он писал отзывы'
+        )
+
+    def test_title_save_keeps_rating(self):
+        create_titles(1, reviews_per_title=2)
+        title = Title.objects.get()
+        Review.objects.filter(title=title).first().delete()
+        title.name = 'Новое название'
+        title.save()
+        title.refresh_from_db()
+        assert title.review_count == 1, (
+            'Проверьте, что сохранение произведения не перезаписывает рейтинг'
+        )
+
+    def test_recalculate_ratings_fixes_drift(self):
+        create_titles(2)
+        Title.objects.update(rating_sum=0, review_count=0, rating=None)
+
+        call_command('recalculate_ratings')
+
+        assert list(
+            Title.objects.values_list('rating_sum', 'review_count', 'rating')
+        ) == [(6, 3, 2.0), (6, 3, 2.0)], (
+            'Проверьте, что `recalculate_ratings` пересчитывает рейтинг'
+        )
+
+
+@pytest.mark.django_db
+class TestTitleRatingOrdering:
+
+    def create_rated_titles(self):
+        movie = Category.objects.create(name='Фильм', slug='movie')
+        book = Category.objects.create(name='Книга', slug='book')
+        author = User.objects.create(username='author', email='a@yamdb.fake')
+        for name, year, category, score in (
+            ('Б', 2001, movie, 9),
+            ('А', 2000, movie, 9),
+            ('В', 1999, movie, 5),
+            ('Г', 2002, book, 10),
+            ('Д', 2003, movie, None),
+        ):
+            title = Title.objects.create(name=name, year=year,
+                                         category=category)
+            if score is not None:
+                Review.objects.create(
+                    title=title, author=author, text='Отзыв', score=score
+                )
+
+    def get_names(self, client, url):
+        response = client.get(url)
+        assert response.status_code == 200, (
+            f'Проверьте, что GET-запрос на `{url}` возвращает статус 200'
+        )
+        return [item['name'] for item in response.json()['results']]
+
+    def test_order_by_rating_keeps_unrated_last(self, client):
+        self.create_rated_titles()
+
+        assert self.get_names(
+            client, '/api/v1/titles/?ordering=-rating,year'
+        ) == ['Г', 'А', 'Б', 'В', 'Д'], (
+            'Проверьте, что `?ordering=-rating,year` сортирует по убыванию '
+            'рейтинга, затем по году, а произведения без отзывов идут '
+            'последними'
+        )
+        assert self.get_names(client, '/api/v1/titles/?ordering=rating') == [
+            'В', 'Б', 'А', 'Г', 'Д'
+        ], (
+            'Проверьте, что при сортировке по возрастанию рейтинга '
+            'произведения без отзывов тоже идут последними'
+        )
+
+    def test_rating_filters(self, client):
+        self.create_rated_titles()
+
+        assert self.get_names(
+            client,
+            '/api/v1/titles/?category=movie&rating__gte=8&ordering=-rating',
+        ) == ['Б', 'А'], (
+            'Проверьте фильтр `rating__gte` вместе с фильтром по категории'
+        )
+        assert self.get_names(
+            client, '/api/v1/titles/?rating__lte=9'
+        ) == ['А', 'Б', 'В'], 'Проверьте фильтр `rating__lte`'
+
+    def test_rating_filters_use_rounded_rating(self, client):
+        authors = [
+            User.objects.create(username=f'author{i}', email=f'{i}@yamdb.fake')
+            for i in range(3)
+        ]
+        for name, scores in (
+            ('А', (7, 8)), ('Б', (8, 8, 7)), ('В', (7, 7, 8)),
+            ('Г', (8, 9)),
+        ):
+            title = Title.objects.create(name=name, year=2000)
+            for author, score in zip(authors, scores):
+                Review.objects.create(
+                    title=title, author=author, text='Отзыв', score=score
+                )
+
+        response = client.get('/api/v1/titles/')
+        assert {
+            item['name']: item['rating']
+            for item in response.json()['results']
+        } == {'А': 8, 'Б': 8, 'В': 7, 'Г': 8}, (
+            'Проверьте, что рейтинг округляется `round`: x.5 к четному'
+        )
+        assert self.get_names(client, '/api/v1/titles/?rating__gte=8') == [
+            'А', 'Б', 'Г'
+        ], (
+            'Проверьте, что `rating__gte` сравнивает рейтинг, '
+            'округленный так же, как в ответе'
+        )
+        assert self.get_names(client, '/api/v1/titles/?rating__lte=7') == [
+            'В'
+        ], (
+            'Проверьте, что `rating__lte` сравнивает рейтинг, '
+            'округленный так же, как в ответе'
+        )
+        assert self.get_names(
+            client, '/api/v1/titles/?rating__gte=9'
+        ) == [], 'Проверьте, что рейтинг 8.5 не проходит `rating__gte=9`'
+
+    def test_ordering_with_cursor_pagination(self, client):
+        response = client.get(
+            '/api/v1/titles/?pagination=cursor&ordering=-rating'
+        )
+        assert response.status_code == 400, (
+            'Проверьте, что `ordering` с keyset пагинацией возвращает '
+            'статус 400'
+        )